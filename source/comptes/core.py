@@ -1,13 +1,39 @@
 import csv
-from datetime import datetime
+from array import array
+from bisect import bisect_left, bisect_right
+import datetime
+import json
+from functools import lru_cache
+import math
 import re
 import os
-from PySide6.QtCore import *
-from .utils import random_id, create_category_pixmap, create_category_icon, json_dump, json_load
+import time
+import zlib
+from .utils import random_id, random_ids, json_dump, json_dumps, json_load, json_iter_load, get_number_of_days, binary_dump, \
+    binary_load, is_binary_file, get_array_bytes, detect_encoding
 
 
 __dir__ = os.path.dirname(__file__)
 
+BINARY_EXTENSION = '.cptb'
+PROGRESS_STEP = 10_000
+BACKUP_COUNT = 3
+IMPORT_CHUNK_SIZE = 4096
+JOURNAL_EXTENSION = '.journal'
+CLASSIFIER_EXTENSION = '.classifier'
+CLASSIFIER_THRESHOLD = 0.8
+
+AMOUNT_PATTERNS = dict()
+
+CREDIT_AGRICOLE_DATE_PATTERN = re.compile(r'\d{2}/\d{2}/\d{4}')
+CREDIT_AGRICOLE_LINE_PATTERN = re.compile(r'^\d{2}/\d{2}/\d{4};', re.MULTILINE)
+LABEL_TOKEN_PATTERN = re.compile(r'[^\W\d_]{2,}')
+OFX_FIELD_PATTERN = re.compile(r'<(\w+)>([^<\r\n]*)')
+QIF_DATE_PATTERN = re.compile(r'(\d{1,2})\s*[/.-]\s*(\d{1,2})\s*[/.\'-]\s*(\d{2,4})')
+
+IMPORTERS = list()
+SNIFF_SIZE = 4096
+
 
 class COLORS:
 
@@ -45,36 +71,1003 @@ class REPEAT_MODE:
     ANNUALLY = 4
 
 
-class Project:
+class OperationStore:
+
+    # operations by id, in insertion order
+    def __init__(self, operations=None):
+        self.operations_map = dict()
+
+        for operation in operations or list():
+            self.add(operation)
+
+    def __iter__(self):
+        return iter(self.operations_map.values())
+
+    def __len__(self):
+        return len(self.operations_map)
+
+    def __contains__(self, operation):
+        return self.operations_map.get(operation.id) is operation
+
+    def get(self, id_):
+        return self.operations_map.get(id_)
+
+    def add(self, operation):
+        if operation.id in self.operations_map:
+            raise Exception(f'Operation id {operation.id!r} already used')
+
+        self.operations_map[operation.id] = operation
+
+    def add_unique(self, operation):
+        # ids colliding in a file are renewed, the operation then loses the links pointing to it
+        if operation.id in self.operations_map:
+            new_id = random_id()
+            print(f'Duplicated operation id {operation.id!r} replaced by {new_id!r}')
+            operation.id = new_id
+
+        self.operations_map[operation.id] = operation
+
+    def pop_ids(self, ids):
+        operations = list()
+        for id_ in ids:
+            operation = self.operations_map.pop(id_, None)
+            if operation is not None:
+                operations.append(operation)
+
+        return operations
+
+    def get_data(self):
+        return list(self.operations_map.values())
+
+
+class OperationIndex:
+
+    def __init__(self):
+        self.accounts_map = dict()
+        self.keys_map = dict()
+        self.counts = dict()
+
+    @staticmethod
+    def get_key(operation):
+        year, month, _ = operation.date.get_year_month_day()
+        return operation.account, year, month
+
+    def clear(self):
+        self.accounts_map.clear()
+        self.keys_map.clear()
+        self.counts.clear()
+
+    def add(self, operation):
+        key = self.get_key(operation)
+        account, year, month = key
+
+        years_map = self.accounts_map.setdefault(account, dict())
+        months_map = years_map.setdefault(year, dict())
+
+        # months hold their operations as dict keys, in insertion order, so removing one does not scan the month
+        months_map.setdefault(month, dict())[operation] = None
+
+        self.keys_map[operation] = key
+        self.counts[account] = self.counts.get(account, 0) + 1
+
+    def remove(self, operation):
+        account, year, month = self.keys_map.pop(operation)
+        self.counts[account] -= 1
+
+        years_map = self.accounts_map[account]
+        months_map = years_map[year]
+        month_operations = months_map[month]
+        del month_operations[operation]
+
+        # prune empty branches so get_years stays accurate
+        if not month_operations:
+            del months_map[month]
+        if not months_map:
+            del years_map[year]
+        if not years_map:
+            del self.accounts_map[account]
+            del self.counts[account]
+
+    def update(self, operation):
+        if self.keys_map.get(operation) == self.get_key(operation):
+            return
+
+        self.remove(operation)
+        self.add(operation)
+
+    def get_years(self, account=None):
+        if account is None:
+            years_maps = self.accounts_map.values()
+        else:
+            years_maps = [self.accounts_map.get(account, dict())]
+
+        years = set()
+        for years_map in years_maps:
+            years.update(years_map.keys())
+
+        return years
+
+    def get_count(self, account):
+        return self.counts.get(account, 0)
+
+    def get_months(self, account, year):
+        return sorted(self.accounts_map.get(account, dict()).get(year, dict()))
+
+    def get_operations(self, account, year=None, month=None):
+        years_map = self.accounts_map.get(account, dict())
+
+        if year is None:
+            months_maps = [years_map[x] for x in sorted(years_map)]
+        else:
+            months_maps = [years_map.get(year, dict())]
+
+        operations = list()
+        for months_map in months_maps:
+            if month is None:
+                for x in sorted(months_map):
+                    operations += months_map[x]
+            else:
+                operations += months_map.get(month, dict())
+
+        return operations
+
+
+class BalanceLedger:
+
+    def __init__(self, operations=None):
+        self.days = list()
+        self.balances = list()
+
+        if operations:
+            for day, cents in sorted((x.date, x.amount.cents) for x in operations):
+                self.append(day, cents)
+
+    def append(self, day, cents):
+        balance = self.balances[-1] if self.balances else 0
+        self.days.append(day)
+        self.balances.append(balance + cents)
+
+    def add(self, day, cents):
+        # most new operations are the latest ones, only the balances after them move
+        index = bisect_right(self.days, day)
+        balance = self.balances[index - 1] if index else 0
+        self.days.insert(index, day)
+        self.balances.insert(index, balance + cents)
+        self.shift(index + 1, cents)
+
+    def remove(self, day, cents):
+        index = bisect_left(self.days, day)
+        if index == len(self.days) or self.days[index] != day:
+            raise Exception(f'No balance found on {day}')
+
+        del self.days[index]
+        del self.balances[index]
+        self.shift(index, -cents)
+
+    def shift(self, index, cents):
+        if index < len(self.balances):
+            self.balances[index:] = [x + cents for x in self.balances[index:]]
+
+    def get_balance(self, day=None):
+        if day is None:
+            index = len(self.balances)
+        else:
+            index = bisect_right(self.days, day)
+
+        return self.balances[index - 1] if index else 0
+
+
+class OperationColumns:
+
+    def __init__(self, operations=None):
+        # one account year as parallel columns, summing them does not touch the Operation objects
+        self.cents = array('q')
+        self.months = array('q')
+        self.category_indices = array('q')
+
+        self.categories = list()
+        self.categories_map = dict()
+
+        if operations:
+            for operation in operations:
+                self.append(operation)
+
+    def append(self, operation):
+        category_index = self.categories_map.get(operation.category)
+        if category_index is None:
+            category_index = self.categories_map[operation.category] = len(self.categories)
+            self.categories.append(operation.category)
+
+        self.cents.append(operation.amount.cents)
+        self.months.append(operation.date.month())
+        self.category_indices.append(category_index)
+
+    def __len__(self):
+        return len(self.cents)
+
+    def get_category_rows(self):
+        # (category, month) sums in one flat list
+        totals = [0] * (len(self.categories) * 12)
+        for cents, month, category_index in zip(self.cents, self.months, self.category_indices):
+            totals[category_index * 12 + month - 1] += cents
+
+        category_rows = dict()
+        for category_index, category in enumerate(self.categories):
+            category_rows[category] = totals[category_index * 12:category_index * 12 + 12]
+
+        return category_rows
+
+
+class ProjectChange:
+
+    def __init__(self):
+        self.added = list()
+        self.removed = list()
+        self.changed = list()
+
+        # operations are edited in place, where they were indexed before the change is kept here
+        self.previous_keys = dict()
+
+        self.accounts = False
+        self.categories = False
+
+    def get_operations(self):
+        return self.added + self.removed + self.changed
+
+    def merge(self, change):
+        self.added += change.added
+        self.removed += change.removed
+        self.changed += change.changed
+
+        # the key from before the batch is the one views know about
+        for operation, key in change.previous_keys.items():
+            self.previous_keys.setdefault(operation, key)
+
+        self.accounts = self.accounts or change.accounts
+        self.categories = self.categories or change.categories
+
+
+class ProjectBatch:
+
+    def __init__(self, project):
+        self.project = project
+
+        self.added_operations = list()
+        self.updated_operations = list()
+        self.deleted_ids = list()
+
+    def __enter__(self):
+        self.project.batches.append(self)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.project.batches.pop()
+
+        # on failure adds and deletes are dropped, but updated operations were already edited in place,
+        # their update still goes through so the indexes, ledgers and journal follow them
+        if exc_type is not None:
+            self.added_operations = list()
+            self.deleted_ids = list()
+
+        # a nested batch is applied along with the outermost one
+        if self.project.batches:
+            outer_batch = self.project.batches[-1]
+            outer_batch.added_operations += self.added_operations
+            outer_batch.updated_operations += self.updated_operations
+            outer_batch.deleted_ids += self.deleted_ids
+        else:
+            self.project.apply_batch(self)
+
+    def add(self, operation):
+        self.added_operations.append(operation)
+
+    def update(self, operation, previous_operation=None):
+        self.updated_operations.append((operation, previous_operation))
+
+    def delete(self, operation):
+        self.deleted_ids.append(operation.id)
+
+
+class SummaryPivot:
+
+    def __init__(self):
+        self.project = None
+        self.account = None
+        self.year = None
+
+        self.rows = dict()
+        self.total_row = [0] * 12
+        self.balance_row = [0] * 12
+
+    def add_operation(self, operation, sign=1):
+        if operation.account is not self.account:
+            return
+
+        year, month, _ = operation.date.get_year_month_day()
+        pivot_year = int(self.year)
+        cents = sign * operation.amount.cents
+
+        if year == pivot_year:
+            items = [operation.category]
+            if operation.category is not None:
+                items += get_category_parents(operation.category)
+
+            for item in items:
+                row = self.rows.get(item)
+                if row is None:
+                    row = self.rows[item] = [0] * 12
+                row[month - 1] += cents
+
+            self.total_row[month - 1] += cents
+
+        # the balance carries over to every later month, including the following years
+        if year < pivot_year:
+            first_index = 0
+        elif year == pivot_year:
+            first_index = month - 1
+        else:
+            return
+
+        for index in range(first_index, 12):
+            self.balance_row[index] += cents
+
+    def reload(self):
+        self.rows = dict()
+        self.total_row = [0] * 12
+        self.balance_row = [0] * 12
+
+        if self.project is None or self.account is None or not self.year:
+            return
+
+        year = int(self.year)
+
+        category_rows = self.project.get_operation_columns(self.account, year).get_category_rows()
+
+        # roll categories up their group hierarchy
+        for category, category_row in category_rows.items():
+            self.rows[category] = category_row
+
+            for index, cents in enumerate(category_row):
+                self.total_row[index] += cents
+
+            if category is None:
+                continue
+
+            for category_group in get_category_parents(category):
+                category_group_row = self.rows.get(category_group)
+                if category_group_row is None:
+                    category_group_row = self.rows[category_group] = [0] * 12
+
+                for index, cents in enumerate(category_row):
+                    category_group_row[index] += cents
+
+        # balance at the end of each month
+        ledger = self.project.get_balance_ledger(self.account)
+        for index in range(12):
+            month = index + 1
+            days_in_month = get_number_of_days(month, year)
+            last_day_month_date = Date(year, month, days_in_month)
+
+            self.balance_row[index] = ledger.get_balance(last_day_month_date)
+
+
+class Categorizer:
+
+    def __init__(self, categories):
+        self.categories = list(categories)
+        self.signature = self.get_signature(self.categories)
+
+        # the first category owning a keyword wins, like it does when checking categories in order
+        self.keyword_priorities = dict()
+        for priority, category in enumerate(self.categories):
+            for keyword in category.keywords:
+                keyword = keyword.lower()
+                if keyword:
+                    self.keyword_priorities.setdefault(keyword, priority)
+
+        trie = dict()
+        for keyword, priority in self.keyword_priorities.items():
+            node = trie
+            for character in keyword:
+                node = node.setdefault(character, dict())
+            node[''] = priority
+
+        # the pattern reports the longest keyword starting at a position, the other keywords starting there are its
+        # prefixes so their priorities are folded into it
+        self.match_priorities = dict()
+        for keyword, priority in self.keyword_priorities.items():
+            node = trie
+            for character in keyword:
+                node = node[character]
+                priority = min(priority, node.get('', priority))
+            self.match_priorities[keyword] = priority
+
+        if trie:
+            self.pattern = re.compile(self.get_trie_pattern(trie))
+        else:
+            self.pattern = None
+
+    @staticmethod
+    def get_signature(categories):
+        return tuple((category, tuple(category.keywords)) for category in categories)
+
+    @classmethod
+    def get_trie_pattern(cls, node):
+        # branching on one character at a time is what makes a single pattern faster than testing each keyword
+        alternatives = [re.escape(x) + cls.get_trie_pattern(y) for x, y in sorted(node.items()) if x]
+
+        if not alternatives:
+            return str()
+
+        pattern = '(?:' + '|'.join(alternatives) + ')'
+
+        # greedy, longer keywords are tried first
+        if '' in node:
+            pattern += '?'
+
+        return pattern
+
+    def get_category(self, label):
+        if self.pattern is None:
+            return None
+
+        label = label.lower()
+
+        priority = None
+        position = 0
+        while True:
+            match = self.pattern.search(label, position)
+            if match is None:
+                break
+
+            match_priority = self.match_priorities[match.group()]
+            if priority is None or match_priority < priority:
+                priority = match_priority
+
+                if priority == 0:
+                    break
+
+            position = match.start() + 1
+
+        if priority is None:
+            return None
+
+        return self.categories[priority]
+
+    def categorize(self, operations):
+        count = 0
+        for operation in operations:
+            category = self.get_category(operation.label)
+
+            if category is not None:
+                operation.category = category
+                count += 1
+
+        return count
+
+
+class LabelClassifier:
+
+    def __init__(self):
+        # multinomial naive bayes over hashed label tokens, counts are keyed by category id
+        self.document_counts = dict()
+        self.token_counts = dict()
+        self.feature_counts = dict()
+
+        # what each operation was trained with, by operation id, so an edit takes it back before training again
+        self.trained_operations = dict()
+
+    @staticmethod
+    def get_features(label):
+        # crc32 gives the same feature in every session, the builtin hash of a str is salted per process
+        return [zlib.crc32(x.encode('utf-8')) for x in LABEL_TOKEN_PATTERN.findall(label.lower())]
+
+    def train(self, label, category_id, weight=1):
+        features = self.get_features(label)
+        if not features:
+            return
+
+        add_count(self.document_counts, category_id, weight)
+        add_count(self.token_counts, category_id, weight * len(features))
+
+        for feature in features:
+            counts = self.feature_counts.setdefault(feature, dict())
+            add_count(counts, category_id, weight)
+
+            if not counts:
+                del self.feature_counts[feature]
+
+    def untrain(self, label, category_id):
+        self.train(label, category_id, -1)
+
+    def train_operation(self, operation):
+        trained = self.trained_operations.pop(operation.id, None)
+        current = None if operation.category is None else (operation.label, operation.category.id)
+
+        if trained != current:
+            if trained is not None:
+                self.untrain(*trained)
+            if current is not None:
+                self.train(*current)
+
+        if current is not None:
+            self.trained_operations[operation.id] = current
+
+    def untrain_operation(self, operation):
+        trained = self.trained_operations.pop(operation.id, None)
+        if trained is not None:
+            self.untrain(*trained)
+
+    def set_trained_operations(self, operations):
+        # the counts on disk were saved along with the main file, so they match its operations
+        self.trained_operations = {x.id: (x.label, x.category.id) for x in operations if x.category is not None}
+
+    def predict(self, label, category_ids):
+        features = self.get_features(label)
+        if not any(x in self.feature_counts for x in features):
+            return None, 0.0
+
+        documents_count = sum(self.document_counts.values())
+        vocabulary_size = len(self.feature_counts)
+
+        # a token unseen by a category adds log(1 / (tokens + vocabulary)), the seen ones add their count on top
+        scores = dict()
+        for category_id, count in self.document_counts.items():
+            if category_id in category_ids:
+                scores[category_id] = (
+                    math.log(count / documents_count)
+                    - len(features) * math.log(self.token_counts[category_id] + vocabulary_size)
+                )
+
+        for feature in features:
+            for category_id, count in self.feature_counts.get(feature, dict()).items():
+                if category_id in scores:
+                    scores[category_id] += math.log1p(count)
+
+        if not scores:
+            return None, 0.0
+
+        best_category_id = max(scores, key=scores.get)
+        best_score = scores[best_category_id]
+        probability = 1 / sum(math.exp(x - best_score) for x in scores.values())
+
+        return best_category_id, probability
+
+    def categorize(self, operations, categories):
+        categories_map = {x.id: x for x in categories}
+
+        count = 0
+        for operation in operations:
+            category_id, probability = self.predict(operation.label, categories_map)
+
+            if category_id is not None and probability >= CLASSIFIER_THRESHOLD:
+                operation.category = categories_map[category_id]
+                count += 1
+
+        return count
+
+    def get_data(self):
+        data = {
+            'document_counts': self.document_counts,
+            'token_counts': self.token_counts,
+            'feature_counts': {str(x): y for x, y in self.feature_counts.items()},
+        }
+        return data
+
+    def set_data(self, data):
+        self.document_counts = data['document_counts']
+        self.token_counts = data['token_counts']
+        self.feature_counts = {int(x): y for x, y in data['feature_counts'].items()}
+
+
+class DuplicateIndex:
+
+    def __init__(self, operations=()):
+        # an imported operation is a duplicate only while the project has more copies left than were matched
+        self.counts = dict()
+        for operation in operations:
+            fingerprint = self.get_fingerprint(operation)
+            self.counts[fingerprint] = self.counts.get(fingerprint, 0) + 1
+
+    @staticmethod
+    def get_fingerprint(operation):
+        return operation.account.id, int(operation.date), operation.amount.cents, get_normalized_label(operation.label)
+
+    def filter(self, operations):
+        new_operations = list()
+        duplicate_operations = list()
+
+        for operation in operations:
+            fingerprint = self.get_fingerprint(operation)
+            count = self.counts.get(fingerprint, 0)
+
+            if count:
+                self.counts[fingerprint] = count - 1
+                duplicate_operations.append(operation)
+            else:
+                new_operations.append(operation)
+
+        return new_operations, duplicate_operations
+
+
+class Project:
+
+    def __init__(self):
+        self.accounts = list()
+        self.operations = OperationStore()
+        self.categories = list()
+        self.category_groups = list()
+
+        self.operation_index = OperationIndex()
+        self.balance_ledgers = dict()
+        self.operation_columns = dict()
+        self.summary_pivots = dict()
+        self.categorizer = None
+        self.classifier = None
+
+        self.undefined_category = Category()
+        self.undefined_category.name = 'Undefined'
+        self.undefined_category.emoji = '❔'
+        self.undefined_category.color = (100, 100, 100)
+
+        self.version = '1'
+
+        self.file = None
+        self.journal_entries = list()
+
+        self.listeners = list()
+        self.batches = list()
+        self.batch_change = None
+
+    def add_operation(self, operation):
+        self.add_operations([operation])
+
+    def add_operations(self, operations):
+        if len(operations) > 1:
+            self.drop_balance_ledgers(operations)
+
+        for operation in operations:
+            self.operations.add(operation)
+            self.operation_index.add(operation)
+            self.add_journal_entry('add_operation', operation.get_data())
+
+            if self.classifier is not None:
+                self.classifier.train_operation(operation)
+
+            self.patch_aggregates(operation)
+
+        change = ProjectChange()
+        change.added = list(operations)
+        self.notify(change)
+
+    def update_operation(self, operation, previous_operation=None):
+        previous_key = self.operation_index.keys_map[operation]
+
+        # operations are edited in place, a copy taken beforehand lets the aggregates take its amounts back
+        if previous_operation is not None:
+            self.patch_aggregates(previous_operation, -1)
+            self.patch_aggregates(operation)
+        else:
+            previous_account, previous_year, _ = previous_key
+            self.balance_ledgers.pop(previous_account, None)
+            self.balance_ledgers.pop(operation.account, None)
+
+            self.operation_columns.pop((previous_account, previous_year), None)
+            self.operation_columns.pop((operation.account, operation.date.year()), None)
+
+            self.drop_summary_pivots(previous_account, previous_year)
+            self.drop_summary_pivots(operation.account, operation.date.year())
+
+        self.operation_index.update(operation)
+
+        if self.classifier is not None:
+            self.classifier.train_operation(operation)
+
+        self.add_journal_entry('update_operation', operation.get_data())
+
+        change = ProjectChange()
+        change.changed.append(operation)
+        change.previous_keys[operation] = previous_key
+        self.notify(change)
+
+    def safe_delete_operation(self, operation):
+        self.delete_operations([operation.id])
+
+    def delete_operations(self, ids):
+        operations = self.operations.pop_ids(ids)
+
+        if len(operations) > 1:
+            self.drop_balance_ledgers(operations)
+
+        for operation in operations:
+            self.operation_index.remove(operation)
+
+            self.patch_aggregates(operation, -1)
+
+            if self.classifier is not None:
+                self.classifier.untrain_operation(operation)
+
+            self.add_journal_entry('delete_operation', {'id': operation.id})
+
+        change = ProjectChange()
+        change.removed = operations
+        self.notify(change)
+
+        return operations
+
+    def drop_balance_ledgers(self, operations):
+        # patching a ledger walks every later balance, past one operation a rebuild on the next query is cheaper
+        for operation in operations:
+            self.balance_ledgers.pop(operation.account, None)
+
+            previous_key = self.operation_index.keys_map.get(operation)
+            if previous_key is not None:
+                self.balance_ledgers.pop(previous_key[0], None)
+
+    def patch_aggregates(self, operation, sign=1):
+        ledger = self.balance_ledgers.get(operation.account)
+        if ledger is not None:
+            if sign > 0:
+                ledger.add(operation.date, operation.amount.cents)
+            else:
+                ledger.remove(operation.date, operation.amount.cents)
+
+        # rows are only appended, a removed one gets its columns rebuilt on the next query
+        key = operation.account, operation.date.year()
+        if sign > 0:
+            columns = self.operation_columns.get(key)
+            if columns is not None:
+                columns.append(operation)
+        else:
+            self.operation_columns.pop(key, None)
+
+        for pivot in self.summary_pivots.values():
+            pivot.add_operation(operation, sign)
+
+    def add_listener(self, listener):
+        self.listeners.append(listener)
+
+    def remove_listener(self, listener):
+        self.listeners.remove(listener)
+
+    def batch(self):
+        return ProjectBatch(self)
+
+    def apply_batch(self, batch):
+        if not (batch.added_operations or batch.updated_operations or batch.deleted_ids):
+            return
+
+        deleted_operations = [x for x in map(self.operations.get, batch.deleted_ids) if x is not None]
+
+        updated_operations = [x for x, _ in batch.updated_operations]
+        self.drop_balance_ledgers(batch.added_operations + updated_operations + deleted_operations)
+
+        # every change of the batch goes out as one
+        self.batch_change = ProjectChange()
+
+        try:
+            self.add_operations(batch.added_operations)
+
+            for operation, previous_operation in batch.updated_operations:
+                if operation in self.operations:
+                    self.update_operation(operation, previous_operation)
+
+            self.delete_operations(batch.deleted_ids)
+        finally:
+            change, self.batch_change = self.batch_change, None
+
+        self.notify(change)
+
+    def notify(self, change):
+        if self.batch_change is not None:
+            self.batch_change.merge(change)
+            return
+
+        for listener in list(self.listeners):
+            listener(change)
+
+    def add_journal_entry(self, action, data):
+        # an unsaved project has no journal, its first save writes everything
+        if self.file is not None:
+            self.journal_entries.append((action, data))
+
+    def add_account(self, account):
+        self.accounts.append(account)
+        self.update_accounts()
+
+    def update_accounts(self):
+        self.add_journal_entry('set_accounts', {'accounts': list(self.accounts)})
+
+        change = ProjectChange()
+        change.accounts = True
+        self.notify(change)
+
+    def update_categories(self):
+        data = {
+            'categories': list(self.categories),
+            'category_groups': list(self.category_groups),
+        }
+        self.add_journal_entry('set_categories', data)
+
+        # the group hierarchy may have changed, every roll-up is stale
+        self.summary_pivots.clear()
+
+        change = ProjectChange()
+        change.categories = True
+        self.notify(change)
+
+    def reload_operation_index(self):
+        self.operation_index.clear()
+        for operation in self.operations:
+            self.operation_index.add(operation)
+
+        self.balance_ledgers.clear()
+        self.operation_columns.clear()
+        self.summary_pivots.clear()
+
+    def drop_summary_pivots(self, account, year):
+        # an operation changes its own year and the balances of every later year
+        for key in [x for x in self.summary_pivots if x[0] is account and x[1] >= year]:
+            del self.summary_pivots[key]
+
+    def get_balance_ledger(self, account):
+        ledger = self.balance_ledgers.get(account)
+
+        if ledger is None:
+            ledger = BalanceLedger(self.get_account_operations(account))
+            self.balance_ledgers[account] = ledger
+
+        return ledger
+
+    def get_operation_columns(self, account, year):
+        key = account, year
+
+        columns = self.operation_columns.get(key)
+        if columns is None:
+            columns = OperationColumns(self.operation_index.get_operations(account, year))
+            self.operation_columns[key] = columns
+
+        return columns
+
+    def get_categorizer(self):
+        # keywords are edited in place, the signature tells when the compiled pattern is stale
+        if self.categorizer is None or self.categorizer.signature != Categorizer.get_signature(self.categories):
+            self.categorizer = Categorizer(self.categories)
+
+        return self.categorizer
+
+    def get_classifier(self):
+        if self.classifier is None:
+            self.train_classifier()
+
+        return self.classifier
+
+    def train_classifier(self):
+        self.classifier = LabelClassifier()
+
+        for operation in self.operations:
+            self.classifier.train_operation(operation)
+
+    def categorize_operations(self, operations=None):
+        if operations is None:
+            operations = self.operations
+
+        categorizer = self.get_categorizer()
+
+        categorized_operations = list()
+        guessed_operations = list()
+        previous_categories = dict()
+        for operation in operations:
+            category = categorizer.get_category(operation.label)
+
+            if category is not None and category is not operation.category:
+                previous_categories[operation] = operation.category
+                operation.category = category
+                categorized_operations.append(operation)
+
+            # the classifier only fills the blanks, keyword matches and manual choices are kept
+            elif category is None and operation.category is None:
+                guessed_operations.append(operation)
 
-    def __init__(self):
-        self.accounts = list()
-        self.operations = list()
-        self.categories = list()
-        self.category_groups = list()
+        self.get_classifier().categorize(guessed_operations, self.categories)
+        categorized_operations += [x for x in guessed_operations if x.category is not None]
 
-        self.undefined_category = Category()
-        self.undefined_category.name = 'Undefined'
-        self.undefined_category.emoji = '❔'
-        self.undefined_category.color = (100, 100, 100)
+        with self.batch() as batch:
+            for operation in categorized_operations:
+                previous_operation = operation.get_copy()
+                previous_operation.category = previous_categories.get(operation)
+                batch.update(operation, previous_operation)
 
-        self.version = '1'
+        return categorized_operations
 
-    def safe_delete_operation(self, operation):
-        self.operations.remove(operation)
+    def get_summary_pivot(self, account, year):
+        key = account, int(year) if year else None
+
+        pivot = self.summary_pivots.get(key)
+        if pivot is None:
+            pivot = SummaryPivot()
+            pivot.project = self
+            pivot.account = account
+            pivot.year = year
+            pivot.reload()
+
+            if account is not None and year:
+                self.summary_pivots[key] = pivot
+
+        return pivot
 
     def get_data(self):
+        # operations come last so a streaming reader already knows what they point to
         data = {
-            'operations': self.operations,
             'accounts': self.accounts,
             'categories': self.categories,
             'category_groups': self.category_groups,
             'version': self.version,
+            'operations': self.operations,
         }
 
         return data
 
     def set_data(self, data):
+        self.set_data_items(self.get_data_items(data))
+
+    @staticmethod
+    def get_data_items(data):
+        for key, value in data.items():
+            if key == 'operations':
+                for operation_data in value:
+                    yield key, operation_data
+            else:
+                yield key, value
+
+    def set_data_items(self, items):
+        data = dict()
+        accounts_map = None
+        category_groups_map = None
+        categories_map = None
+
+        operations = OperationStore()
+        unresolved_operations = list()
+        linked_operations = list()
+        for key, value in items:
+            if key != 'operations':
+                data[key] = value
+                continue
+
+            # operations are built as they stream in, once the tables they point to are known
+            if accounts_map is None and {'accounts', 'category_groups', 'categories'}.issubset(data):
+                accounts_map, category_groups_map, categories_map = self.get_data_maps(data)
+
+            operation = self.get_operation_from_data(value, accounts_map, categories_map)
+            operations.add_unique(operation)
+
+            # links may point further down the file
+            if value.get('linked_operation.id') is not None:
+                linked_operations.append((operation, value['linked_operation.id']))
+
+            if accounts_map is None:
+                unresolved_operations.append((operation, value['account.id'], value['category.id']))
+
+        if accounts_map is None:
+            accounts_map, category_groups_map, categories_map = self.get_data_maps(data)
+
+        for operation, account_id, category_id in unresolved_operations:
+            operation.account = accounts_map[account_id]
+            operation.category = categories_map.get(category_id)
+
+        for operation, linked_operation_id in linked_operations:
+            operation.linked_operation = operations.get(linked_operation_id)
+
+        self.accounts = list(accounts_map.values())
+        self.operations = operations
+        self.category_groups = list(category_groups_map.values())
+        self.categories = list(categories_map.values())
+        self.version = data.get('version', self.version)
+
+        self.reload_operation_index()
+
+    @staticmethod
+    def get_data_maps(data):
         accounts_map = dict()
         for account_data in data['accounts']:
             account_id = account_data['id']
@@ -124,97 +1117,157 @@ class Project:
 
             categories_map[category_id] = category
 
-        operations = list()
-        for operation_data in data['operations']:
+        return accounts_map, category_groups_map, categories_map
+
+    @staticmethod
+    def get_operation_from_data(operation_data, accounts_map=None, categories_map=None):
+        amount_txt = operation_data['amount']
+        amount = Amount.from_string(amount_txt)
+
+        operation_id = operation_data.get('id') or random_id()
+
+        date = operation_data['date']
+        date = Date.from_string(date)
+
+        account = None
+        if accounts_map is not None:
             account_id = operation_data['account.id']
             account = accounts_map[account_id]
 
-            amount_txt = operation_data['amount']
-            amount = Amount.from_string(amount_txt)
+        operation = Operation.create(operation_id, operation_data['label'], amount, date, account)
+        operation.note = operation_data['note']
+        operation.is_budget = operation_data.get('is_budget', False)
 
+        if categories_map is not None:
             category_id = operation_data['category.id']
-            category = categories_map.get(category_id)
+            operation.category = categories_map.get(category_id)
 
-            operation_id = operation_data.get('id')
+        return operation
 
-            date = operation_data['date']
-            date = Date.from_string(date)
+    def get_binary_sections(self):
+        metadata = {
+            'accounts': self.accounts,
+            'categories': self.categories,
+            'category_groups': self.category_groups,
+            'version': self.version,
+        }
+
+        # every string is stored once and operations point to it by index
+        strings_map = dict()
+
+        columns = {
+            'operations.id': array('q'),
+            'operations.label': array('q'),
+            'operations.note': array('q'),
+            'operations.account.id': array('q'),
+            'operations.category.id': array('q'),
+            'operations.linked_operation.id': array('q'),
+            'operations.amount': array('q'),
+            'operations.date': array('q'),
+            'operations.is_budget': array('q'),
+        }
+
+        for operation in self.operations:
+            category = operation.category
+            linked_operation = operation.linked_operation
+
+            category_index = -1 if category is None else strings_map.setdefault(category.id, len(strings_map))
+            linked_index = -1 if linked_operation is None else strings_map.setdefault(linked_operation.id, len(strings_map))
+
+            columns['operations.id'].append(strings_map.setdefault(operation.id, len(strings_map)))
+            columns['operations.label'].append(strings_map.setdefault(operation.label, len(strings_map)))
+            columns['operations.note'].append(strings_map.setdefault(operation.note, len(strings_map)))
+            columns['operations.account.id'].append(strings_map.setdefault(operation.account.id, len(strings_map)))
+            columns['operations.category.id'].append(category_index)
+            columns['operations.linked_operation.id'].append(linked_index)
+            columns['operations.amount'].append(operation.amount.cents)
+            columns['operations.date'].append(operation.date)
+            columns['operations.is_budget'].append(int(operation.is_budget))
+
+        sections = {
+            'metadata': json_dumps(metadata).encode('utf-8'),
+            'strings': json_dumps(list(strings_map)).encode('utf-8'),
+        }
+        for name, values in columns.items():
+            sections[name] = get_array_bytes(values)
+
+        return sections
+
+    def set_binary_data(self, container, progress=None):
+        data = container.get_json('metadata')
+        strings = container.get_json('strings')
+
+        accounts_map, category_groups_map, categories_map = self.get_data_maps(data)
+
+        columns = (
+            container.get_array('operations.id', 'q'),
+            container.get_array('operations.label', 'q'),
+            container.get_array('operations.note', 'q'),
+            container.get_array('operations.account.id', 'q'),
+            container.get_array('operations.category.id', 'q'),
+            container.get_array('operations.linked_operation.id', 'q'),
+            container.get_array('operations.amount', 'q'),
+            container.get_array('operations.date', 'q'),
+            container.get_array('operations.is_budget', 'q'),
+        )
+
+        operations_count = len(columns[0])
 
-            operation = Operation()
-            if operation_id:
-                operation.id = operation_id
-            operation.account = account
-            operation.label = operation_data['label']
-            operation.amount = amount
-            operation.category = category
-            operation.date = date
-            operation.note = operation_data['note']
-            operation.is_budget = operation_data.get('is_budget', False)
+        operations = OperationStore()
+        linked_operations = list()
+        for values in zip(*columns):
+            id_index, label_index, note_index, account_index, category_index, linked_index, cents, day, is_budget = values
 
-            operations.append(operation)
+            if progress is not None and len(operations) % PROGRESS_STEP == 0:
+                progress(len(operations), operations_count)
+
+            account = accounts_map[strings[account_index]]
+            operation = Operation.create(strings[id_index], strings[label_index], Amount(cents), Date(day), account)
+            operation.category = None if category_index == -1 else categories_map.get(strings[category_index])
+            operation.note = strings[note_index]
+            operation.is_budget = bool(is_budget)
+
+            operations.add_unique(operation)
+
+            if linked_index != -1:
+                linked_operations.append((operation, strings[linked_index]))
+
+        for operation, linked_operation_id in linked_operations:
+            operation.linked_operation = operations.get(linked_operation_id)
 
         self.accounts = list(accounts_map.values())
         self.operations = operations
         self.category_groups = list(category_groups_map.values())
         self.categories = list(categories_map.values())
+        self.version = data.get('version', self.version)
 
-    def get_years(self):
-        years = list()
-
-        for operation in self.operations:
-            operation_year = str(operation.date.year())
+        self.reload_operation_index()
 
-            if operation_year not in years:
-                years.append(operation_year)
+    def get_years(self):
+        years = [str(x) for x in self.operation_index.get_years()]
 
         years.sort()
         years.reverse()
         return years
 
     def get_account_operations(self, account):
-        account_operations = list()
+        return self.operation_index.get_operations(account)
 
-        for operation in self.operations:
-            if operation.account is account:
-                account_operations.append(operation)
-
-        return account_operations
+    def get_account_operations_count(self, account):
+        return self.operation_index.get_count(account)
 
     def get_year_account_operations(self, account, year):
-        account_operations = self.get_account_operations(account)
-
-        year_account_operation = list()
-        for account_operation in account_operations:
-            operation_year = account_operation.date.year()
-
-            if operation_year == int(year):
-                year_account_operation.append(account_operation)
-
-        return year_account_operation
+        return self.operation_index.get_operations(account, int(year))
 
     def get_month_account_operations(self, account, year, month):
-        year_account_operations = self.get_year_account_operations(account, year)
-
-        month_account_operation = list()
-        for account_operation in year_account_operations:
-            operation_month = account_operation.date.month()
-
-            if operation_month == int(month):
-                month_account_operation.append(account_operation)
-
-        return month_account_operation
+        return self.operation_index.get_operations(account, int(year), int(month))
 
     def get_balance(self, account, date=None):
-        balance = Amount()
-
-        if date is not None:
+        if isinstance(date, str):
             date = Date.from_string(date)
 
-        account_operations = self.get_account_operations(account)
-        for operation in account_operations:
-
-            if date is None or operation.date <= date:
-                balance += operation.amount
+        ledger = self.get_balance_ledger(account)
+        balance = Amount(ledger.get_balance(date))
 
         return balance
     #
@@ -271,17 +1324,178 @@ class Project:
     #     return months_data, year_data
 
     def save(self, file):
-        json_dump(self, file)
+        self.write(file)
+        self.set_saved(file)
 
-    @classmethod
-    def open(cls, file):
-        data = json_load(file)
+    def write(self, file):
+        if os.path.splitext(file)[1].lower() == BINARY_EXTENSION:
+            binary_dump(self.get_binary_sections(), file, backups=BACKUP_COUNT)
+        else:
+            json_dump(self, file, backups=BACKUP_COUNT)
+
+        self.save_classifier(file)
+
+    def save_classifier(self, file):
+        classifier_file = get_classifier_file(file)
+
+        if self.classifier is not None:
+            json_dump(self.classifier, classifier_file)
+
+        # a classifier left by another project would not match this one
+        elif os.path.exists(classifier_file):
+            os.remove(classifier_file)
+
+    def load_classifier(self):
+        classifier_file = get_classifier_file(self.file)
+
+        if os.path.exists(classifier_file):
+            self.classifier = LabelClassifier()
+            self.classifier.set_data(json_load(classifier_file))
+            self.classifier.set_trained_operations(self.operations)
+
+    def set_saved(self, file, journal_entries_count=None):
+        # the main file now holds everything the journal did
+        journal_file = get_journal_file(file)
+        if os.path.exists(journal_file):
+            os.remove(journal_file)
+
+        self.file = file
+
+        # entries queued while the file was being written are kept
+        if journal_entries_count is None:
+            journal_entries_count = len(self.journal_entries)
+        del self.journal_entries[:journal_entries_count]
+
+    def save_journal(self):
+        if self.file is None:
+            raise Exception('No file registered')
 
-        version = data.get('version', None)
-        print('version', version)
+        lines = [json_dumps({'action': x, 'data': y}, indent=None) + '\n' for x, y in self.journal_entries]
+
+        with open(get_journal_file(self.file), 'a', encoding='utf-8') as f:
+            f.writelines(lines)
+            f.flush()
+            os.fsync(f.fileno())
+
+        self.journal_entries.clear()
+
+    def has_journal(self):
+        return self.file is not None and os.path.exists(get_journal_file(self.file))
+
+    def compact(self):
+        # only fold what has been saved, pending entries are unsaved changes
+        if self.journal_entries:
+            raise Exception('Unsaved changes must be saved to the journal before compacting')
+
+        if self.has_journal():
+            self.save(self.file)
+
+    def replay_journal(self):
+        journal_file = get_journal_file(self.file)
+
+        with open(journal_file, 'r', encoding='utf-8') as f:
+            lines = f.readlines()
+
+        accounts_map = {x.id: x for x in self.accounts}
+        categories_map = {x.id: x for x in self.categories}
+
+        # a crash between writing the main file and removing the journal leaves entries the file already holds,
+        # replaying them again must change nothing
+        for line_number, line in enumerate(lines):
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                # a crash mid-append leaves a torn last line, drop it so the next append starts clean
+                if line_number == len(lines) - 1:
+                    print(f'Ignoring incomplete journal entry {line!r}')
+                    with open(journal_file, 'w', encoding='utf-8') as f:
+                        f.writelines(lines[:-1])
+                    break
+                raise
+
+            action = entry['action']
+            data = entry['data']
+
+            if action == 'add_operation':
+                if self.operations.get(data['id']) is not None:
+                    continue
+
+                operation = self.get_operation_from_data(data, accounts_map, categories_map)
+                operation.linked_operation = self.operations.get(data.get('linked_operation.id'))
+                self.add_operation(operation)
+
+            elif action == 'update_operation':
+                source_operation = self.get_operation_from_data(data, accounts_map, categories_map)
+                operation = self.operations.get(source_operation.id)
+                if operation is None:
+                    continue
+
+                previous_operation = operation.get_copy()
+
+                operation.account = source_operation.account
+                operation.label = source_operation.label
+                operation.amount = source_operation.amount
+                operation.category = source_operation.category
+                operation.date = source_operation.date
+                operation.note = source_operation.note
+                operation.is_budget = source_operation.is_budget
+                operation.linked_operation = self.operations.get(data.get('linked_operation.id'))
+                self.update_operation(operation, previous_operation)
+
+            elif action == 'delete_operation':
+                self.delete_operations([data['id']])
+
+            elif action == 'set_accounts':
+                for account_data in data['accounts']:
+                    account = accounts_map.get(account_data['id'])
+                    if account is None:
+                        account = Account()
+                        account.id = account_data['id']
+                        self.accounts.append(account)
+                        accounts_map[account.id] = account
+
+                    account.name = account_data['name']
+                    account.number = account_data['number']
+
+            elif action == 'set_categories':
+                data['accounts'] = list()
+                _, category_groups_map, categories_map = self.get_data_maps(data)
+
+                self.category_groups = list(category_groups_map.values())
+                self.categories = list(categories_map.values())
+
+                for operation in self.operations:
+                    if operation.category is not None:
+                        operation.category = categories_map.get(operation.category.id)
+
+                self.operation_columns.clear()
+                self.summary_pivots.clear()
+
+            else:
+                raise Exception(f'Unknown journal action {action!r}')
+
+        # replayed changes are already on disk
+        self.journal_entries.clear()
 
+    @classmethod
+    def open(cls, file, progress=None):
         project = cls()
-        project.set_data(data)
+
+        if is_binary_file(file):
+            with binary_load(file) as container:
+                project.set_binary_data(container, progress)
+        else:
+            project.set_data_items(json_iter_load(file, stream_keys=('operations',), progress=progress))
+
+        project.file = file
+
+        # saved along with the main file only, the replayed changes then train it
+        project.load_classifier()
+
+        if project.has_journal():
+            project.replay_journal()
+
+        print('version', project.version)
 
         return project
 
@@ -289,41 +1503,59 @@ class Project:
     def new(cls):
         file = os.path.join(__dir__, 'data', 'new_project.json')
         project = cls.open(file)
+        project.file = None
         return project
 
-    def import_credit_agricole_csv(self, file, account):
-        with open(file, 'r') as csv_file:
-            csv_reader = csv.reader(csv_file, delimiter=';')
-            lines = [x for x in list(csv_reader) if x]
+    def import_operations(self, file, account):
+        operations, skipped_operations = self.read_import(file, account)
 
-        # operations
-        operations = list()
-        for line in lines:
-            first_item = line[0]
+        with self.batch() as batch:
+            for operation in operations:
+                batch.add(operation)
 
-            date_match = re.match(r'\d{2}/\d{2}/\d{4}', first_item)
+        return skipped_operations
 
-            if date_match:
-                date, label, amount_taken, amount_given, _ = line
+    def read_import(self, file, account, progress=None, categorize=True):
+        importer, encoding = get_importer(file)
 
-                if amount_taken:
-                    amount_text = f'-{amount_taken}'
-                elif amount_given:
-                    amount_text = amount_given
-                else:
-                    raise Exception(f'Neither amount taken nor amount taken found for line {line!r}')
+        start_time = time.perf_counter()
 
-                amount = Amount.from_string(amount_text)
+        # overlapping statements only bring their new lines
+        duplicate_index = DuplicateIndex(self.get_account_operations(account))
 
-                operation = Operation()
-                operation.label = label.strip()
-                operation.date = Date.from_string(date)
-                operation.amount = amount
-                operation.account = account
+        categorizer = self.get_categorizer() if categorize else None
+        categorized_count = 0
 
-                operations.append(operation)
+        operations = list()
+        skipped_operations = list()
+        for chunk in importer.iter_operations(file, account, encoding, progress):
+            new_operations, duplicate_operations = duplicate_index.filter(chunk)
+
+            # categorized before being added, no update or reload needed afterwards
+            if categorizer is not None:
+                categorized_count += categorizer.categorize(new_operations)
+
+                uncategorized_operations = [x for x in new_operations if x.category is None]
+                categorized_count += self.get_classifier().categorize(uncategorized_operations, self.categories)
+
+            operations += new_operations
+            skipped_operations += duplicate_operations
+
+        duration = time.perf_counter() - start_time
+        lines_count = len(operations) + len(skipped_operations)
+        print(
+            f'Imported {len(operations)} operations with {importer.name} ({encoding}) in {duration:.3f}s '
+            f'({lines_count / max(duration, 1e-9):.0f} operations/s), {categorized_count} categorized'
+        )
 
-        self.operations += operations
+        if skipped_operations:
+            print(f'Skipped {len(skipped_operations)} operations already in the project:')
+            for operation in skipped_operations[:20]:
+                print(f'    {operation.date} {operation.amount} {operation.label}')
+            if len(skipped_operations) > 20:
+                print(f'    ... and {len(skipped_operations) - 20} more')
+
+        return operations, skipped_operations
 
     def get_categories(self, category_group):
         categories = list()
@@ -350,6 +1582,23 @@ class Operation:
         self.is_budget = False
         self.linked_operation = None
 
+    @classmethod
+    def create(cls, id_, label, amount, date, account):
+        # skips the placeholder account and date built by __init__, bulk imports create a lot of these
+        operation = cls.__new__(cls)
+
+        operation.id = id_
+        operation.account = account
+        operation.label = label
+        operation.amount = amount
+        operation.category = None
+        operation.date = date
+        operation.note = str()
+        operation.is_budget = False
+        operation.linked_operation = None
+
+        return operation
+
     def get_copy(self):
         operation = self.__class__()
 
@@ -409,10 +1658,7 @@ class Operations:
         return categories
 
     def get_year_total(self):
-        total = Amount()
-        for operation in self.operations:
-            total += operation.amount
-        return total
+        return Amount.sum(x.amount for x in self.operations)
 
     def get_months(self):
         months = list()
@@ -425,13 +1671,13 @@ class Operations:
         return months
 
     def get_month_total(self):
-        month_map = {x: Amount() for x in Date.month_labels}
+        month_map = {x: 0 for x in Date.month_labels}
 
         for operation in self.operations:
             month_name = operation.date.get_month_name()
-            month_map[month_name] += operation.amount
+            month_map[month_name] += operation.amount.cents
 
-        return month_map
+        return {x: Amount(y) for x, y in month_map.items()}
 
     def get_month_average(self):
         return self.get_year_total() / 12
@@ -502,22 +1748,6 @@ class CategoryGroup:
         }
         return data
 
-    def get_pixmap(self, radius):
-        pixmap = create_category_pixmap(
-            text='',
-            color=self.color,
-            radius=radius
-        )
-        return pixmap
-
-    def get_icon(self, radius):
-        icon = create_category_icon(
-            text=self.emoji,
-            color=self.color,
-            radius=radius
-        )
-        return icon
-
     def get_color(self):
         return self.color
 
@@ -552,24 +1782,8 @@ class Category:
         }
         return data
 
-    def get_pixmap(self, radius):
-        pixmap = create_category_pixmap(
-            text=self.emoji,
-            color=self.get_color(),
-            radius=radius
-        )
-        return pixmap
-
-    def get_icon(self, radius):
-        icon = create_category_icon(
-            text=self.emoji,
-            color=self.get_color(),
-            radius=radius
-        )
-        return icon
-
 
-class Date(QDate):
+class Date(int):
 
     month_labels = (
         'january',
@@ -586,15 +1800,57 @@ class Date(QDate):
         'december',
     )
 
+    def __new__(cls, *args):
+        if not args:
+            ordinal = datetime.date.today().toordinal()
+        elif len(args) == 1:
+            ordinal = args[0]
+        else:
+            ordinal = datetime.date(*args).toordinal()
+
+        return super().__new__(cls, ordinal)
+
     def __str__(self):
-        return self.toString('dd/MM/yyyy')
+        year, month, day = self.get_year_month_day()
+        return f'{day:02d}/{month:02d}/{year:04d}'
+
+    def __repr__(self):
+        return f'{type(self).__name__}({str(self)!r})'
 
     @classmethod
     def from_string(cls, s):
-        return cls(datetime.strptime(s, '%d/%m/%Y'))
+        return get_cached_date(cls, s)
+
+    @classmethod
+    def from_strings(cls, strings):
+        # each distinct string is only parsed once per batch
+        dates = {x: cls.from_string(x) for x in set(strings)}
+        return [dates[x] for x in strings]
+
+    def get_year_month_day(self):
+        date = datetime.date.fromordinal(self)
+        return date.year, date.month, date.day
+
+    def year(self):
+        return datetime.date.fromordinal(self).year
+
+    def month(self):
+        return datetime.date.fromordinal(self).month
+
+    def day(self):
+        return datetime.date.fromordinal(self).day
+
+    def add_months(self, months):
+        year, month, day = self.get_year_month_day()
+
+        year, month_index = divmod(year * 12 + month - 1 + months, 12)
+        month = month_index + 1
+        day = min(day, get_number_of_days(month, year))
+
+        return self.__class__(year, month, day)
 
     def get_month_name(self):
-        return self.toString('MMMM').lower()
+        return self.month_labels[self.month() - 1]
 
 
 # class Amount:
@@ -676,16 +1932,31 @@ class Date(QDate):
 #         return amount
 
 
-class Amount:
+class AmountFormatter:
 
-    def __init__(self, cents:int=0):
-        self.cents = cents
+    def __init__(self):
         self.symbol = '€'
         self.separator = ','
         self.units_separator = ' '
         self.pattern_with_cents = '{units}{separator}{cents:02d} {symbol}'
         self.pattern_without_cents = '{units} {symbol}'
 
+
+class Amount:
+
+    __slots__ = ('cents',)
+
+    formatter = AmountFormatter()
+
+    def __init__(self, cents:int=0):
+        object.__setattr__(self, 'cents', cents)
+
+    def __setattr__(self, key, value):
+        raise AttributeError(f'{type(self).__name__} is immutable')
+
+    def __hash__(self):
+        return hash(self.cents)
+
     def __eq__(self, other):
         if isinstance(other, Amount):
             is_equal = self.cents == other.cents
@@ -739,39 +2010,75 @@ class Amount:
         new_amount = Amount(cents)
         return new_amount
 
+    @classmethod
+    def sum(cls, amounts):
+        cents = 0
+        for amount in amounts:
+            cents += amount.cents
+
+        return cls(cents)
+
     @classmethod
     def from_string(cls, s):
-        amount = cls()
+        # amounts are immutable so the same literal can share one instance
+        return get_cached_amount(cls, s, cls.formatter.separator)
+
+    @classmethod
+    def from_strings(cls, strings):
+        # each distinct string is only parsed once per batch, skipping the shared cache that mostly misses here
+        separator = cls.formatter.separator
+        amounts = {x: cls(cls.get_cents_from_string(x, separator)) for x in set(strings)}
+        return [amounts[x] for x in strings]
+
+    @staticmethod
+    def get_cents_from_string(s, separator):
+        # remove space characters from string, chained replace beats str.translate here
+        s = s.replace('\u202f', '').replace('\xa0', '').replace(' ', '')
+
+        compiled_pattern = AMOUNT_PATTERNS.get(separator)
+        if compiled_pattern is None:
+            compiled_pattern = AMOUNT_PATTERNS[separator] = re.compile(r'(-?)(\d*)' + re.escape(separator) + r'(\d*)')
+
+        match = compiled_pattern.match(s)
+        if not match:
+            raise Exception(f'String {s!r} does not match pattern {compiled_pattern.pattern!r}')
 
-        space_characters = '\u202f', '\xa0', ' '
-        for x in space_characters:
-            s = s.replace(x, '') # remove space characters from string
+        sign, units, cents = match.groups()
 
-        pattern = r'(-?)(\d*)' + amount.separator + r'(\d*)'
+        cents_total = int(units) * 100 if units else 0
 
-        match = re.match(pattern, s)
-        if match:
-            sign, units, cents = match.groups()
+        if cents:
+            cents_total += int(cents)
 
-            if units:
-                amount.cents += int(units) * 100
+        if sign:
+            cents_total = -cents_total
 
-            if cents:
-                amount.cents += int(cents)
+        return cents_total
 
-            if sign is '-':
-                amount.cents *= -1
+    @staticmethod
+    def get_cents_from_decimal_string(s):
+        # the last of '.' or ',' is the decimal separator, the other one groups thousands
+        s = s.replace('\u202f', '').replace('\xa0', '').replace(' ', '').replace('+', '')
 
+        separator_index = max(s.rfind('.'), s.rfind(','))
+        if separator_index == -1:
+            units, cents = s, str()
         else:
-            raise Exception(f'String {s!r} does not match pattern {pattern!r}')
+            units = s[:separator_index].replace('.', '').replace(',', '')
+            cents = s[separator_index + 1:]
+
+        sign = -1 if units.startswith('-') else 1
+        units = units.lstrip('-')
 
-        return amount
+        if not (units or cents) or not (units + cents).isdigit():
+            raise Exception(f'String {s!r} is not a decimal amount')
+
+        cents_total = int(units or 0) * 100 + int((cents + '00')[:2])
+        return sign * cents_total
 
     @classmethod
     def from_units(cls, units):
-        amount = cls()
-        amount.cents = int(units * 100)
-        return amount
+        return cls(int(units * 100))
 
     def as_units_and_cents(self):
         units, cents = divmod(abs(self.cents), 100)
@@ -781,15 +2088,16 @@ class Amount:
     def as_units(self):
         return self.cents / 100
 
-    @staticmethod
-    def get_formatted_string_units(sign, units):
+    @classmethod
+    def get_formatted_string_units(cls, sign, units):
+        units_separator = cls.formatter.units_separator
         units_str = ''
 
         count = 0
         for x in reversed(str(units)):
             if count == 3:
                 count = 0
-                units_str += ' '
+                units_str += units_separator
 
             count += 1
             units_str += x
@@ -799,24 +2107,26 @@ class Amount:
         return units_str
 
     def as_string_with_cents(self):
+        formatter = self.formatter
         sign, units, cents = self.as_units_and_cents()
         units_str = self.get_formatted_string_units(sign, units)
 
-        s = self.pattern_with_cents.format(
+        s = formatter.pattern_with_cents.format(
             units=units_str,
             cents=abs(cents),
-            symbol=self.symbol,
-            separator=self.separator,
+            symbol=formatter.symbol,
+            separator=formatter.separator,
         )
         return s
 
     def as_string_without_cents(self):
+        formatter = self.formatter
         sign, units, cents = self.as_units_and_cents()
         units_str = self.get_formatted_string_units(sign, units)
 
-        s = self.pattern_without_cents.format(
+        s = formatter.pattern_without_cents.format(
             units=units_str,
-            symbol=self.symbol,
+            symbol=formatter.symbol,
         )
         return s
 
@@ -884,6 +2194,259 @@ class Settings:
         return data
 
 
+def register_importer(importer):
+    # an importer is a plain class with a name, its file extensions, sniff(head) telling whether the decoded head
+    # of a file is in its format, and iter_operations(file, account, encoding, progress) yielding lists of operations
+    IMPORTERS.append(importer)
+    return importer
+
+
+@register_importer
+class CreditAgricoleCsvImporter:
+
+    name = 'Crédit Agricole (.csv)'
+    extensions = ('.csv',)
+
+    @classmethod
+    def sniff(cls, head):
+        return bool(CREDIT_AGRICOLE_LINE_PATTERN.search(head))
+
+    @classmethod
+    def iter_operations(cls, file, account, encoding, progress=None):
+        for lines in cls.iter_chunks(file, encoding, progress):
+            yield cls.get_operations(lines, account)
+
+    @staticmethod
+    def iter_chunks(file, encoding, progress=None, chunk_size=IMPORT_CHUNK_SIZE):
+        size = os.path.getsize(file)
+
+        with open(file, 'r', encoding=encoding) as csv_file:
+            position = 0
+
+            def iter_text_lines():
+                nonlocal position
+                for text_line in csv_file:
+                    # characters read, close enough to bytes for a progress bar
+                    position += len(text_line)
+                    yield text_line
+
+            csv_reader = csv.reader(iter_text_lines(), delimiter=';')
+
+            lines = list()
+            for line in csv_reader:
+                if not line:
+                    continue
+
+                lines.append(line)
+                if len(lines) == chunk_size:
+                    yield lines
+                    lines = list()
+
+                    if progress is not None:
+                        progress(min(position, size), size)
+
+            if lines:
+                yield lines
+
+    @staticmethod
+    def get_operations(lines, account):
+        dates = list()
+        labels = list()
+        amount_texts = list()
+
+        for line in lines:
+            if not CREDIT_AGRICOLE_DATE_PATTERN.match(line[0]):
+                continue
+
+            date, label, amount_taken, amount_given, _ = line
+
+            if amount_taken:
+                amount_text = f'-{amount_taken}'
+            elif amount_given:
+                amount_text = amount_given
+            else:
+                raise Exception(f'Neither amount taken nor amount taken found for line {line!r}')
+
+            dates.append(date)
+            labels.append(label.strip())
+            amount_texts.append(amount_text)
+
+        ids = random_ids(len(dates))
+        dates = Date.from_strings(dates)
+        amounts = Amount.from_strings(amount_texts)
+
+        return [Operation.create(*x, account) for x in zip(ids, labels, amounts, dates)]
+
+
+@register_importer
+class OfxImporter:
+
+    name = 'OFX (.ofx)'
+    extensions = ('.ofx', '.qfx')
+
+    @classmethod
+    def sniff(cls, head):
+        head = head.upper()
+        return 'OFXHEADER' in head or '<OFX>' in head
+
+    @classmethod
+    def iter_operations(cls, file, account, encoding, progress=None):
+        operations = list()
+        for fields in cls.iter_transactions(file, encoding, progress):
+            operations.append(cls.get_operation(fields, account))
+
+            if len(operations) == IMPORT_CHUNK_SIZE:
+                yield operations
+                operations = list()
+
+        if operations:
+            yield operations
+
+    @staticmethod
+    def iter_transactions(file, encoding, progress=None):
+        size = os.path.getsize(file)
+
+        with open(file, 'r', encoding=encoding) as f:
+            position = 0
+            buffer = str()
+
+            while True:
+                chunk = f.read(1 << 16)
+                position += len(chunk)
+                buffer += chunk
+
+                # transactions are aggregates, their closing tag is mandatory even in SGML files
+                blocks = buffer.split('</STMTTRN>')
+                buffer = blocks.pop()
+
+                for block in blocks:
+                    block = block[block.rfind('<STMTTRN>'):]
+                    yield {key.upper(): value.strip() for key, value in OFX_FIELD_PATTERN.findall(block)}
+
+                if progress is not None:
+                    progress(min(position, size), size)
+
+                if not chunk:
+                    break
+
+    @staticmethod
+    def get_operation(fields, account):
+        posted = fields.get('DTPOSTED')
+        amount = fields.get('TRNAMT')
+
+        if not posted or not amount:
+            raise Exception(f'Transaction {fields!r} has no date or amount')
+
+        label = fields.get('NAME') or fields.get('MEMO', str())
+
+        date = Date(int(posted[:4]), int(posted[4:6]), int(posted[6:8]))
+        amount = Amount(Amount.get_cents_from_decimal_string(amount))
+
+        return Operation.create(random_id(), label, amount, date, account)
+
+
+@register_importer
+class QifImporter:
+
+    name = 'QIF (.qif)'
+    extensions = ('.qif',)
+
+    @classmethod
+    def sniff(cls, head):
+        head = head.lstrip().lower()
+        return head.startswith('!type:') or head.startswith('!account') or head.startswith('!option:')
+
+    @staticmethod
+    def is_day_first(file, encoding):
+        # the order is decided once for the whole file, a single date past the 12th settles it
+        day_first = False
+        month_first = False
+
+        with open(file, 'r', encoding=encoding) as f:
+            for text_line in f:
+                text_line = text_line.strip()
+                if not text_line.startswith('D'):
+                    continue
+
+                date_match = QIF_DATE_PATTERN.search(text_line)
+                if not date_match:
+                    continue
+
+                first, second, _ = (int(x) for x in date_match.groups())
+                day_first = day_first or first > 12
+                month_first = month_first or second > 12
+
+        if day_first and month_first:
+            raise Exception(f'Dates of {file!r} mix day first and month first orders')
+
+        # quicken writes month first, which is also what an ambiguous file is read as
+        if not day_first and not month_first:
+            print(f'No date of {file!r} tells the day from the month, reading them month first')
+
+        return day_first
+
+    @classmethod
+    def iter_operations(cls, file, account, encoding, progress=None):
+        size = os.path.getsize(file)
+        day_first = cls.is_day_first(file, encoding)
+
+        with open(file, 'r', encoding=encoding) as f:
+            position = 0
+            fields = dict()
+
+            operations = list()
+            for text_line in f:
+                position += len(text_line)
+
+                text_line = text_line.strip()
+                if not text_line or text_line.startswith('!'):
+                    continue
+
+                if text_line.startswith('^'):
+                    if fields:
+                        operations.append(cls.get_operation(fields, account, day_first))
+                        fields = dict()
+
+                    if len(operations) == IMPORT_CHUNK_SIZE:
+                        yield operations
+                        operations = list()
+
+                        if progress is not None:
+                            progress(min(position, size), size)
+
+                    continue
+
+                # split transactions repeat S/E/$ fields, only the first of each is kept
+                fields.setdefault(text_line[0], text_line[1:].strip())
+
+            if fields:
+                operations.append(cls.get_operation(fields, account, day_first))
+
+            if operations:
+                yield operations
+
+    @staticmethod
+    def get_operation(fields, account, day_first=False):
+        date_match = QIF_DATE_PATTERN.search(fields.get('D', str()))
+        amount = fields.get('T') or fields.get('U')
+
+        if not date_match or not amount:
+            raise Exception(f'Transaction {fields!r} has no date or amount')
+
+        first, second, year = (int(x) for x in date_match.groups())
+        day, month = (first, second) if day_first else (second, first)
+
+        if year < 100:
+            year += 2000 if year < 70 else 1900
+
+        label = fields.get('P') or fields.get('M', str())
+
+        date = Date(year, month, day)
+        amount = Amount(Amount.get_cents_from_decimal_string(amount))
+
+        return Operation.create(random_id(), label, amount, date, account)
+
+
 def get_category_parents(item, data=None):
     if data is None:
         data = list()
@@ -900,3 +2463,62 @@ def get_category_parents(item, data=None):
         get_category_parents(parent, data=data)
 
     return data
+
+
+@lru_cache(maxsize=4096)
+def get_cached_amount(cls, s, separator):
+    return cls(cls.get_cents_from_string(s, separator))
+
+
+@lru_cache(maxsize=4096)
+def get_cached_date(cls, s):
+    day, month, year = s.split('/')
+    return cls(int(year), int(month), int(day))
+
+
+def get_normalized_label(label):
+    return ' '.join(label.casefold().split())
+
+
+def get_journal_file(file):
+    return file + JOURNAL_EXTENSION
+
+
+def get_classifier_file(file):
+    return file + CLASSIFIER_EXTENSION
+
+
+def add_count(counts, key, count):
+    count += counts.get(key, 0)
+
+    if count > 0:
+        counts[key] = count
+    else:
+        counts.pop(key, None)
+
+
+def get_importer(file):
+    with open(file, 'rb') as f:
+        head = f.read(SNIFF_SIZE)
+
+    encoding = detect_encoding(file)
+    head = head.decode(encoding, errors='ignore')
+    extension = os.path.splitext(file)[1].lower()
+
+    importers = [x for x in IMPORTERS if x.sniff(head)]
+    if not importers:
+        raise Exception(f'No importer recognizes {file!r}')
+
+    # the extension only breaks ties between formats recognizing the same content
+    for importer in importers:
+        if extension in importer.extensions:
+            return importer, encoding
+
+    return importers[0], encoding
+
+
+def get_importer_extensions():
+    extensions = list()
+    for importer in IMPORTERS:
+        extensions += [x for x in importer.extensions if x not in extensions]
+    return extensions
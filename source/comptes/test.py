@@ -1,7 +1,20 @@
-from .core import Amount
+import json
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+from .core import Amount, Date, Operation, Project, get_cached_amount, get_cached_date, get_journal_file
+from .utils import json_dumps, json_load, random_id
 
 def run_test():
     amount2_test()
+    binary_round_trip_test()
+    journal_test()
+    amount_from_string_benchmark()
+    project_open_benchmark()
+    credit_agricole_import_benchmark()
 
 def amount2_test():
 
@@ -28,3 +41,145 @@ def amount2_test():
     print('amountB', amountB.as_string_without_cents())
     print('amountC', amountC.as_string_without_cents())
     print('amountD', amountD.as_string_without_cents())
+
+def amount_from_string_benchmark(count=200_000):
+    unique_strings = [Amount(random.randint(-10_000_000, 10_000_000)).as_string_with_cents()[:-2] for _ in range(count)]
+    repeated_strings = [random.choice(('-9,99', '-12,50', '1 500,00', '-45,00')) for _ in range(count)]
+
+    for name, strings in (('unique', unique_strings), ('repeated', repeated_strings)):
+        get_cached_amount.cache_clear()
+
+        start = time.perf_counter()
+        for s in strings:
+            Amount.from_string(s)
+        duration = time.perf_counter() - start
+
+        print(f'Amount.from_string ({name}): {count / duration:,.0f} amounts/s')
+
+def create_random_project(count):
+    project = Project.new()
+    account = project.accounts[0]
+
+    operations = list()
+    for index in range(count):
+        operation = Operation()
+        operation.account = account
+        operation.label = f'CB OPERATION {index}'
+        operation.amount = Amount(random.randint(-100_000, 100_000))
+        operation.date = Date(random.randint(2010, 2024), random.randint(1, 12), random.randint(1, 28))
+        operation.category = random.choice(project.categories + [None])
+        operations.append(operation)
+    project.add_operations(operations)
+
+    return project
+
+def binary_round_trip_test(count=1_000):
+    project = create_random_project(count)
+
+    operations = list(project.operations)
+    operations[0].note = 'note'
+    operations[1].is_budget = True
+    operations[2].linked_operation = operations[3]
+
+    with tempfile.TemporaryDirectory() as directory:
+        json_file = os.path.join(directory, 'round_trip.json')
+        binary_file = os.path.join(directory, 'round_trip.cptb')
+        round_trip_file = os.path.join(directory, 'round_trip_2.json')
+
+        project.save(json_file)
+        Project.open(json_file).save(binary_file)
+        Project.open(binary_file).save(round_trip_file)
+
+        print('json -> cptb -> json', json_load(json_file) == json_load(round_trip_file), True)
+
+def journal_test(count=100):
+    project = create_random_project(count)
+
+    with tempfile.TemporaryDirectory() as directory:
+        file = os.path.join(directory, 'journal.json')
+        project.save(file)
+
+        project = Project.open(file)
+        operations = list(project.operations)
+
+        operations[0].label = 'EDITED'
+        project.update_operation(operations[0])
+        project.delete_operations([operations[1].id])
+        operation = operations[2].get_copy()
+        operation.id = random_id()
+        project.add_operation(operation)
+        project.save_journal()
+
+        expected_data = json.loads(json_dumps(project))
+
+        reopened_project = Project.open(file)
+        print('journal reopen', json.loads(json_dumps(reopened_project)) == expected_data, True)
+
+        # torn last line, as left by a crash while appending
+        with open(get_journal_file(file), 'a', encoding='utf-8') as f:
+            f.write('{"action": "add_oper')
+
+        reopened_project = Project.open(file)
+        print('journal torn line', json.loads(json_dumps(reopened_project)) == expected_data, True)
+
+        # crash after writing the main file, before the journal is removed
+        project.write(file)
+
+        reopened_project = Project.open(file)
+        print('journal crash before removal', json.loads(json_dumps(reopened_project)) == expected_data, True)
+
+        reopened_project = Project.open(file)
+        print('journal reopened twice', json.loads(json_dumps(reopened_project)) == expected_data, True)
+
+def project_open_benchmark(count=100_000):
+    project = create_random_project(count)
+
+    def load_then_build(file):
+        data = json_load(file)
+        project = Project()
+        project.set_data(data)
+
+    with tempfile.TemporaryDirectory() as directory:
+        file = os.path.join(directory, 'benchmark.json')
+        project.save(file)
+        print(f'Project file: {count} operations, {os.path.getsize(file) / 1e6:.1f} MB')
+
+        # tracemalloc gives the peak Python heap, which works on every platform unlike RSS
+        for name, func in (('json_load + set_data', load_then_build), ('Project.open (streaming)', Project.open)):
+            get_cached_amount.cache_clear()
+            get_cached_date.cache_clear()
+
+            tracemalloc.start()
+            start = time.perf_counter()
+            func(file)
+            duration = time.perf_counter() - start
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            print(f'{name}: {duration:.2f} s, peak {peak / 1e6:.1f} MB')
+
+
+def credit_agricole_import_benchmark(count=50_000):
+    project = Project.new()
+    account = project.accounts[0]
+
+    lines = ['Compte;;;;', 'Date;Libellé;Débit euros;Crédit euros;']
+    for index in range(count):
+        date = f'{random.randint(1, 28):02d}/{random.randint(1, 12):02d}/{random.randint(2010, 2024)}'
+        amount = f'{random.randint(1, 2000)},{random.randint(0, 99):02d}'
+        if random.random() < 0.8:
+            lines.append(f'{date};CB OPERATION {index % 500} ;{amount};;')
+        else:
+            lines.append(f'{date};VIR OPERATION {index % 50};;{amount};')
+
+    with tempfile.TemporaryDirectory() as directory:
+        file = os.path.join(directory, 'benchmark.csv')
+        with open(file, 'w') as f:
+            f.write('\n'.join(lines))
+
+        get_cached_amount.cache_clear()
+        get_cached_date.cache_clear()
+
+        # read_import prints its own throughput
+        operations, _ = project.read_import(file, account)
+        print(f'Crédit Agricole import: {len(operations)} operations')
@@ -2,10 +2,11 @@ import math
 from functools import partial
 
 from PySide6.QtCharts import QChart, QChartView, QLineSeries, QCategoryAxis
+from PySide6.QtCore import *
 from PySide6.QtWidgets import *
 from PySide6.QtGui import *
 from .core import *
-from .utils import print_json, get_one_liner_text, create_category_icon, create_category_pixmap, blend_vectors
+from .utils import print_json, get_one_liner_text, blend_vectors, random_id
 
 __folder__ = os.path.dirname(__file__)
 ICON_FOLDER = os.path.join(__folder__, 'icon')
@@ -22,7 +23,7 @@ class CategoryItem(QTreeWidgetItem):
         self.reload()
 
     def reload(self):
-        icon = self.category.get_icon(32)
+        icon = get_category_icon(self.category, 32)
         self.setText(0, str(self.category))
 
         self.setIcon(0, icon)
@@ -38,7 +39,7 @@ class CategoryGroupItem(QTreeWidgetItem):
         self.reload()
 
     def reload(self):
-        icon = self.category_group.get_icon(32)
+        icon = get_category_icon(self.category_group, 32)
 
         self.setText(0, str(self.category_group))
         self.setIcon(0, icon)
@@ -80,7 +81,7 @@ class CategoryGroupPicker(QLineEdit):
 
         for category_group in self.project.category_groups:
             category_group_action = QAction(self)
-            category_group_action.setIcon(category_group.get_icon(16))
+            category_group_action.setIcon(get_category_icon(category_group, 16))
             category_group_action.setText(category_group.name)
             category_group_action.triggered.connect(
                 partial(
@@ -118,7 +119,8 @@ class DatePicker(QLineEdit):
         self.menu.addAction(widget_action)
 
     def get_selected_date(self):
-        return Date.from_string(self.selected_date.toString('dd/MM/yyyy'))
+        selected_date = self.selected_date
+        return Date(selected_date.year(), selected_date.month(), selected_date.day())
 
     def mousePressEvent(self, event):
         self.menu.exec_(self.mapToGlobal(self.rect().bottomLeft()))
@@ -157,7 +159,7 @@ class CategoryPicker(QLineEdit):
         category_groups_map = dict()
 
         for category_group in self.project.category_groups:
-            icon = category_group.get_icon(16)
+            icon = get_category_icon(category_group, 16)
 
             category_group_menu = QMenu(str(category_group))
             category_group_menu.setIcon(icon)
@@ -166,7 +168,7 @@ class CategoryPicker(QLineEdit):
             self.menu.addMenu(category_group_menu)
 
         for category in self.project.categories:
-            icon = category.get_icon(16)
+            icon = get_category_icon(category, 16)
 
             category_action = QAction(str(category), self)
             category_action.triggered.connect(
@@ -671,212 +673,403 @@ class OperationEditor(QDialog):
         self.is_budget_check.setChecked(is_budget)
         self.note_text_edit.setText(note)
 
-        self.date_picker.set_selected_date(date)
+        self.date_picker.set_selected_date(QDate(*date.get_year_month_day()))
 
 
-class OperationItem(QTreeWidgetItem):
+class OperationsModel(QAbstractItemModel):
+
+    HEADERS_LABEL = 'category', 'date', 'amount', 'label'
+
+    # top level rows are months, an operation row stores its month row + 1 as internal id
+    MONTH_ID = 0
 
     def __init__(self):
         super().__init__()
 
-        self.project = None
-        self.operation = Operation()
+        self.project = Project()
 
-        self.default_brush = self.foreground(0)
-        self.green_brush = QColor(*COLORS.GREEN)
+        self.selected_account = None
+        self.selected_year = None
 
-        self.setSizeHint(0, QSize(0, 40))
+        self.months = list()
+        self.months_operations = dict()
+        self.months_counts = dict()
+
+        self.green_color = QColor(*COLORS.GREEN)
+        self.budget_color = QColor(150, 150, 0)
+        self.size_hint = QSize(0, 40)
 
     def reload(self):
-        # date
-        self.setText(1, str(self.operation.date))
+        self.beginResetModel()
 
-        # label
-        label = get_one_liner_text(self.operation.label)
-        self.setText(3, label)
-        self.setToolTip(3, self.operation.label)
+        self.months = list()
+        self.months_operations = dict()
+        self.months_counts = dict()
 
-        # category
-        category = self.operation.category
-        if category is None:
-            category = self.project.undefined_category
+        if self.selected_account is not None and self.selected_year:
+            self.months = self.get_months()
 
-        self.setText(0, f'{category.emoji} {category.name}')
+            for month in self.months:
+                self.months_counts[month] = len(self.get_project_month_operations(month))
 
-        for index in range(len(OperationsTree.HEADERS_LABEL)):
-            rgba_color = category.get_color() + [25]
-            self.setBackground(index, QColor(*rgba_color))
+        self.endResetModel()
 
-        # amount
-        self.setText(2, str(self.operation.amount))
+    def get_months(self):
+        months = self.project.operation_index.get_months(self.selected_account, int(self.selected_year))
+        return list(reversed(months))
 
-        if self.operation.amount > Amount.from_units(0):
-            brush = QBrush(self.green_brush)
-        else:
-            brush = self.default_brush
+    def get_project_month_operations(self, month):
+        return self.project.get_month_account_operations(self.selected_account, self.selected_year, month)
 
-        self.setForeground(2, brush)
+    def get_sorted_month_operations(self, month):
+        operations = self.get_project_month_operations(month)
+        return list(reversed(sorted(operations, key=lambda x: x.date)))
 
-        # is budget
-        if self.operation.is_budget:
-            for index in range(len(OperationsTree.HEADERS_LABEL)):
-                # self.setBackground(index, QBrush(QColor(255, 255, 0, 25)))
-                self.setForeground(index, QBrush(QColor(150, 150, 0)))
+    def get_month_operations(self, month_row):
+        # months are only sorted once they are expanded
+        month = self.months[month_row]
+        operations = self.months_operations.get(month)
 
+        if operations is None:
+            operations = self.get_sorted_month_operations(month)
+            self.months_operations[month] = operations
 
-class OperationsTree(QTreeWidget):
+        return operations
 
-    HEADERS_LABEL = 'category', 'date', 'amount', 'label'
-    HEADERS_WIDTH = 200, None, None, None
+    def get_operation(self, index):
+        if not index.isValid() or index.internalId() == self.MONTH_ID:
+            return None
 
-    def __init__(self):
-        super().__init__()
+        return self.get_month_operations(index.internalId() - 1)[index.row()]
 
-        self.project = Project()
+    def project_changed(self, change):
+        if self.selected_account is None or not self.selected_year:
+            return
 
-        self.selected_account = None
-        self.selected_year = None
+        if change.categories:
+            # categories only change how the rows look
+            for month_row, month in enumerate(self.months):
+                if month in self.months_operations:
+                    self.emit_rows_changed(month_row, 0, len(self.months_operations[month]) - 1)
 
-        self.setHeaderLabels(self.HEADERS_LABEL)
-        # self.setAlternatingRowColors(True)
-        self.setSelectionMode(self.SelectionMode.ExtendedSelection)
-        self.setIconSize(QSize(22, 22))
+        year = int(self.selected_year)
 
-        for index, width in enumerate(self.HEADERS_WIDTH):
-            if width is None:
+        months = set()
+        for operation in change.get_operations():
+            if operation.account is self.selected_account and operation.date.year() == year:
+                months.add(operation.date.month())
+
+        for account, previous_year, month in change.previous_keys.values():
+            if account is self.selected_account and previous_year == year:
+                months.add(month)
+
+        if not months:
+            return
+
+        # month rows carry the internal id of their operations, a month appearing or vanishing resets the model
+        if self.get_months() != self.months:
+            self.reload()
+            return
+
+        changed_operations = set(change.changed)
+
+        for month in months:
+            if not self.patch_month(self.months.index(month), changed_operations):
+                self.reload()
+                return
+
+    def patch_month(self, month_row, changed_operations):
+        month = self.months[month_row]
+        month_index = self.createIndex(month_row, 0, self.MONTH_ID)
+        operations = self.months_operations.get(month)
+
+        # children never fetched, only their count is known to the view
+        if operations is None:
+            count = self.months_counts[month]
+            new_count = len(self.get_project_month_operations(month))
+
+            if new_count > count:
+                self.beginInsertRows(month_index, count, new_count - 1)
+                self.months_counts[month] = new_count
+                self.endInsertRows()
+            elif new_count < count:
+                self.beginRemoveRows(month_index, new_count, count - 1)
+                self.months_counts[month] = new_count
+                self.endRemoveRows()
+
+            self.dataChanged.emit(month_index, month_index)
+            return True
+
+        new_operations = self.get_sorted_month_operations(month)
+        new_operations_set = set(new_operations)
+
+        # kept rows must already be in their final order, an operation whose date moved within the month is re-inserted
+        kept_operations = [x for x in operations if x in new_operations_set]
+        kept_operations_set = set(kept_operations)
+        if kept_operations != [x for x in new_operations if x in kept_operations_set]:
+            kept_operations = [x for x in kept_operations if x not in changed_operations]
+            kept_operations_set = set(kept_operations)
+            if kept_operations != [x for x in new_operations if x in kept_operations_set]:
+                return False
+
+        # removed rows go by contiguous runs, from the bottom so the rows above keep their numbers
+        row = len(operations) - 1
+        while row >= 0:
+            if operations[row] in kept_operations_set:
+                row -= 1
                 continue
-            self.setColumnWidth(index, width)
 
-    def get_selected_operation_items(self):
+            first_row = row
+            while first_row > 0 and operations[first_row - 1] not in kept_operations_set:
+                first_row -= 1
 
-        selected_items = list()
-        for item in self.selectedItems():
-            if hasattr(item, 'operation'):
-                selected_items.append(item)
+            self.beginRemoveRows(month_index, first_row, row)
+            del operations[first_row:row + 1]
+            self.endRemoveRows()
 
-        return selected_items
+            row = first_row - 1
 
-    def get_selected_operations(self):
-        selected_items = self.get_selected_operation_items()
+        row = 0
+        while row < len(new_operations):
+            if row < len(operations) and operations[row] is new_operations[row]:
+                row += 1
+                continue
 
-        selected_operations = list()
-        for item in selected_items:
-            selected_operations.append(item.operation)
+            last_row = row
+            while last_row + 1 < len(new_operations) and new_operations[last_row + 1] not in kept_operations_set:
+                last_row += 1
 
-        return selected_operations
+            self.beginInsertRows(month_index, row, last_row)
+            operations[row:row] = new_operations[row:last_row + 1]
+            self.endInsertRows()
 
-    def reload(self):
-        self.clear()
+            row = last_row + 1
 
-        operations = reversed(sorted(self.project.operations, key=lambda x: x.date))
+        self.months_counts[month] = len(operations)
 
-        tree_map = dict()
-        for operation in operations:
-            if str(operation.date.year()) != self.selected_year:
-                continue
+        for row, operation in enumerate(operations):
+            if operation in changed_operations:
+                self.emit_rows_changed(month_row, row, row)
 
-            if operation.account is not self.selected_account:
-                continue
+        # the month title shows its operations count
+        self.dataChanged.emit(month_index, month_index)
+        return True
 
-            tree_item = OperationItem()
-            tree_item.project = self.project
-            tree_item.operation = operation
-            tree_item.reload()
+    def emit_rows_changed(self, month_row, first_row, last_row):
+        if last_row < first_row:
+            return
 
-            month_name = operation.date.get_month_name()
-            if month_name not in tree_map:
-                tree_map[month_name] = list()
-            tree_map[month_name].append(tree_item)
+        self.dataChanged.emit(
+            self.createIndex(first_row, 0, month_row + 1),
+            self.createIndex(last_row, len(self.HEADERS_LABEL) - 1, month_row + 1),
+        )
 
-        for month_name, tree_items in tree_map.items():
-            top_level_item = QTreeWidgetItem()
-            top_level_item.setSizeHint(0, QSize(0, 40))
-            top_level_item.setExpanded(False)
+    def index(self, row, column, parent=QModelIndex()):
+        if not self.hasIndex(row, column, parent):
+            return QModelIndex()
 
-            title = f'{month_name.title()} ({len(tree_items)})'
-            top_level_item.setText(0, title)
-            top_level_item.addChildren(tree_items)
+        if not parent.isValid():
+            return self.createIndex(row, column, self.MONTH_ID)
 
-            self.addTopLevelItem(top_level_item)
+        return self.createIndex(row, column, parent.row() + 1)
 
+    def parent(self, index):
+        if not index.isValid() or index.internalId() == self.MONTH_ID:
+            return QModelIndex()
 
-class SummaryItem(QTreeWidgetItem):
+        return self.createIndex(index.internalId() - 1, 0, self.MONTH_ID)
+
+    def rowCount(self, parent=QModelIndex()):
+        if not parent.isValid():
+            return len(self.months)
+
+        if parent.internalId() == self.MONTH_ID and parent.column() == 0:
+            month = self.months[parent.row()]
+            operations = self.months_operations.get(month)
+            if operations is None:
+                return self.months_counts[month]
+            return len(operations)
+
+        return 0
+
+    def columnCount(self, parent=QModelIndex()):
+        return len(self.HEADERS_LABEL)
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if orientation == Qt.Orientation.Horizontal and role == Qt.ItemDataRole.DisplayRole:
+            return self.HEADERS_LABEL[section]
+
+        return None
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+
+        if role == Qt.ItemDataRole.SizeHintRole:
+            return self.size_hint
+
+        column = index.column()
+
+        if index.internalId() == self.MONTH_ID:
+            if role == Qt.ItemDataRole.DisplayRole and column == 0:
+                month = self.months[index.row()]
+                month_name = Date(int(self.selected_year), month, 1).get_month_name()
+                return f'{month_name.title()} ({self.rowCount(index)})'
+
+            return None
+
+        operation = self.get_operation(index)
+
+        if role == Qt.ItemDataRole.DisplayRole:
+            if column == 0:
+                category = self.get_category(operation)
+                return f'{category.emoji} {category.name}'
+            elif column == 1:
+                return str(operation.date)
+            elif column == 2:
+                return str(operation.amount)
+            elif column == 3:
+                return get_one_liner_text(operation.label)
+
+        elif role == Qt.ItemDataRole.ToolTipRole:
+            if column == 3:
+                return operation.label
+
+        elif role == Qt.ItemDataRole.BackgroundRole:
+            rgba_color = self.get_category(operation).get_color() + [25]
+            return QColor(*rgba_color)
+
+        elif role == Qt.ItemDataRole.ForegroundRole:
+            if operation.is_budget:
+                return self.budget_color
+            elif column == 2 and operation.amount.cents > 0:
+                return self.green_color
+
+        return None
+
+    def get_category(self, operation):
+        if operation.category is None:
+            return self.project.undefined_category
+        return operation.category
+
+
+class OperationsTree(QTreeView):
+
+    HEADERS_LABEL = OperationsModel.HEADERS_LABEL
+    HEADERS_WIDTH = 200, None, None, None
+
+    selection_changed = Signal()
 
     def __init__(self):
         super().__init__()
 
-        self.color_rules = [
-            {'color': None, 'func': lambda x: x > Amount.from_units(0)},
-            {'color': None, 'func': lambda x: x < Amount.from_units(0)},
-            {'color': COLORS.LIGHT_GREY, 'func': lambda x: x == Amount.from_units(0)},
-        ]
-        self.display_total = True
-        self.operations = list()
-        self.category = None
+        self.operations_model = OperationsModel()
+        self.setModel(self.operations_model)
 
-        self.setSizeHint(0, QSize(0, 40))
+        # self.setAlternatingRowColors(True)
+        self.setSelectionMode(self.SelectionMode.ExtendedSelection)
+        self.setIconSize(QSize(22, 22))
+        self.setUniformRowHeights(True)
 
-    def reload(self):
-        year_sum = Amount()
-        for index in range(12):
-            month = index + 1
+        for index, width in enumerate(self.HEADERS_WIDTH):
+            if width is None:
+                continue
+            self.setColumnWidth(index, width)
 
-            month_operations = [x for x in self.operations if x.date.month() == month]
+    @property
+    def project(self):
+        return self.operations_model.project
 
-            # amount
-            month_amount = Amount()
-            for operation in month_operations:
-                month_amount += operation.amount
+    @project.setter
+    def project(self, project):
+        self.operations_model.project = project
 
-            year_sum += month_amount
+    @property
+    def selected_account(self):
+        return self.operations_model.selected_account
 
-            self.setText(month, month_amount.as_string_without_cents())
-            self.setTextAlignment(month, Qt.AlignmentFlag.AlignCenter)
+    @selected_account.setter
+    def selected_account(self, account):
+        self.operations_model.selected_account = account
 
-            # color
-            color = None
-            for color_rule in self.color_rules:
-                func = color_rule['func']
-                if func(month_amount):
-                    color = color_rule['color']
+    @property
+    def selected_year(self):
+        return self.operations_model.selected_year
 
-            if color:
-                self.setForeground(month, QColor(*color))
+    @selected_year.setter
+    def selected_year(self, year):
+        self.operations_model.selected_year = year
+
+    def selectionChanged(self, selected, deselected):
+        super().selectionChanged(selected, deselected)
+        self.selection_changed.emit()
 
-        # year
-        if self.display_total:
-            self.setText(13, year_sum.as_string_without_cents())
-            self.setTextAlignment(13, Qt.AlignmentFlag.AlignCenter)
+    def get_selected_operations(self):
+        selected_operations = list()
+        for index in self.selectionModel().selectedRows():
+            operation = self.operations_model.get_operation(index)
+            if operation is not None:
+                selected_operations.append(operation)
 
-        # color
+        return selected_operations
+
+    def project_changed(self, change):
+        self.operations_model.project_changed(change)
+
+    def reload(self):
+        self.operations_model.reload()
+
+
+class SummaryNode:
+
+    def __init__(self):
+        self.parent = None
+        self.children = list()
+        self.row = 0
+
+        self.text = str()
+        self.category = None
+        self.month_totals = [0] * 12
+        self.background = None
+        self.color_rules = [
+            {'color': None, 'func': lambda x: x > 0},
+            {'color': None, 'func': lambda x: x < 0},
+            {'color': COLORS.LIGHT_GREY, 'func': lambda x: x == 0},
+        ]
+
+    def add_child(self, node):
+        node.parent = self
+        node.row = len(self.children)
+        self.children.append(node)
+
+    def get_month_amounts(self):
+        return [Amount(x) for x in self.month_totals]
+
+    def get_color(self, cents):
         color = None
         for color_rule in self.color_rules:
-            func = color_rule['func']
-            if func(year_sum):
+            if color_rule['func'](cents):
                 color = color_rule['color']
-
-        if color:
-            self.setForeground(13, QColor(*color))
-
-
-class SummaryTree(QTreeWidget):
-
-    HEADERS_MAP = {
-        'Category': 250,
-        'January': None,
-        'February': None,
-        'March': None,
-        'April': None,
-        'May': None,
-        'June': None,
-        'July': None,
-        'August': None,
-        'September': None,
-        'October': None,
-        'November': None,
-        'December': None,
-        # 'Year': None
-    }
+        return color
+
+
+class SummaryModel(QAbstractItemModel):
+
+    HEADERS_LABEL = (
+        'Category',
+        'January',
+        'February',
+        'March',
+        'April',
+        'May',
+        'June',
+        'July',
+        'August',
+        'September',
+        'October',
+        'November',
+        'December',
+    )
 
     def __init__(self):
         super().__init__()
@@ -885,146 +1078,247 @@ class SummaryTree(QTreeWidget):
         self.selected_account = None
         self.selected_year = None
 
-        # self.setAlternatingRowColors(True)
-        self.setSelectionMode(self.SelectionMode.ExtendedSelection)
-        self.setIconSize(QSize(20, 20))
+        self.root_node = SummaryNode()
+        self.nodes = list()
+        self.signature = None
 
-        header = self.header()
-        header.setDefaultAlignment(Qt.AlignmentFlag.AlignCenter)
+        self.size_hint = QSize(0, 40)
 
-        headers = list(self.HEADERS_MAP.keys())
-        self.setHeaderLabels(headers)
-
-        for index, width in enumerate(self.HEADERS_MAP.values()):
-            if width:
-                header.setSectionResizeMode(index, QHeaderView.ResizeMode.Fixed)
-                self.setColumnWidth(index, width)
-            else:
-                header.setSectionResizeMode(index, QHeaderView.ResizeMode.Stretch)
+    def get_signature(self):
+        # what the rows and their look depend on, amounts aside
+        category_groups = tuple(
+            (x, x.parent_category_group, x.name, x.emoji, tuple(x.color)) for x in self.project.category_groups
+        )
+        categories = tuple((x, x.category_group, x.name, x.emoji) for x in self.project.categories)
+        return self.project, category_groups, categories
 
     def reload(self):
-        self.clear()
-
         if self.project is None:
             print('No project found')
+            self.beginResetModel()
+            self.root_node = SummaryNode()
+            self.nodes = list()
+            self.signature = None
+            self.endResetModel()
             return
 
-        # operations
-        account_operations = [x for x in self.project.operations if x.account is self.selected_account]
-        year_operations = [x for x in account_operations if str(x.date.year()) == self.selected_year]
+        pivot = self.project.get_summary_pivot(self.selected_account, self.selected_year)
 
-        # balance item
-        balance_item = QTreeWidgetItem()
-        for index in range(len(OperationsTree.HEADERS_LABEL)):
-            balance_item.setSizeHint(index, QSize(0, 40))
-        balance_item.setText(0, 'Balance')
+        signature = self.get_signature()
+        if signature != self.signature:
+            self.beginResetModel()
+            self.build_nodes()
+            self.signature = signature
+            self.set_month_totals(pivot)
+            self.endResetModel()
+            return
 
-        for index in range(12):
-            month = index + 1
+        # same rows, only the cells whose amount changed are repainted
+        previous_month_totals = [list(x.month_totals) for x in self.nodes]
+        self.set_month_totals(pivot)
 
-            balance_amount = Amount()
+        for node, month_totals in zip(self.nodes, previous_month_totals):
+            changed_columns = [x + 1 for x in range(12) if node.month_totals[x] != month_totals[x]]
 
-            if self.selected_year:
-                days_in_month = Date(int(self.selected_year), month, 1).daysInMonth()
-                last_day_month_date = Date(int(self.selected_year), month, days_in_month)
+            if changed_columns:
+                self.dataChanged.emit(
+                    self.createIndex(node.row, changed_columns[0], node),
+                    self.createIndex(node.row, changed_columns[-1], node),
+                )
 
-                for operation in account_operations:
-                    if operation.date > last_day_month_date:
-                        continue
+    def build_nodes(self):
+        self.root_node = SummaryNode()
+        self.nodes = list()
+
+        def add_node(parent_node, text, category=None, background=None):
+            node = SummaryNode()
+            node.text = text
+            node.category = category
+            node.background = background
+            parent_node.add_child(node)
+            self.nodes.append(node)
+            return node
+
+        # balance
+        balance_node = add_node(self.root_node, 'Balance')
+        balance_node.color_rules = [
+            {'color': COLORS.RED, 'func': lambda x: True},
+            {'color': COLORS.ORANGE, 'func': lambda x: x > 0},
+            {'color': COLORS.GREEN, 'func': lambda x: x >= 100_000},
+        ]
 
-                    balance_amount += operation.amount
+        # total
+        total_node = add_node(self.root_node, 'Total')
+        total_node.color_rules = [
+            {'color': COLORS.GREEN, 'func': lambda x: x > 0},
+            {'color': COLORS.RED, 'func': lambda x: x < 0},
+            {'color': COLORS.LIGHT_GREY, 'func': lambda x: x == 0},
+        ]
+
+        # category groups
+        category_group_nodes = dict()
+        for category_group in self.project.category_groups:
+            node = SummaryNode()
+            node.text = f'{category_group.emoji} {category_group.name}'
+            node.category = category_group
+            node.background = QColor(*blend_vectors(category_group.color, (255, 255, 255), 0.8))
+            category_group_nodes[category_group.id] = node
 
-            balance_item.setText(month, balance_amount.as_string_without_cents())
-            balance_item.setTextAlignment(month, Qt.AlignmentFlag.AlignCenter)
+        for category_group in self.project.category_groups:
+            node = category_group_nodes[category_group.id]
+            parent_category_group = category_group.parent_category_group
 
-            # color
-            if balance_amount.as_units() >= 1_000:
-                color = COLORS.GREEN
-            elif balance_amount.as_units() > 0:
-                color = COLORS.ORANGE
+            if parent_category_group:
+                category_group_nodes[parent_category_group.id].add_child(node)
             else:
-                color = COLORS.RED
+                self.root_node.add_child(node)
+            self.nodes.append(node)
 
-            if color:
-                balance_item.setForeground(month, QColor(*color))
-
-        self.addTopLevelItem(balance_item)
-
-        # total item
-        total_item = SummaryItem()
-        total_item.display_total = False
-        total_item.setText(0, 'Total')
-        total_item.operations = year_operations
-        total_item.color_rules = [
-            {'color': COLORS.GREEN, 'func': lambda x: x > Amount.from_units(0)},
-            {'color': COLORS.RED, 'func': lambda x: x < Amount.from_units(0)},
-            {'color': COLORS.LIGHT_GREY, 'func': lambda x: x == Amount.from_units(0)},
-        ]
-        total_item.reload()
+        for category in self.project.categories:
+            background = QColor(*blend_vectors(category.category_group.color, (255, 255, 255), 0.95))
+            text = f'{category.emoji} {category.name}'
+            add_node(category_group_nodes[category.category_group.id], text, category, background)
 
-        self.addTopLevelItem(total_item)
+        # undefined category
+        undefined_category = self.project.undefined_category
+        text = f'{undefined_category.emoji} {undefined_category.name}'
+        add_node(self.root_node, text, background=QColor(230, 230, 230))
 
-        category_group_item_map = dict()
-        for category_group in self.project.category_groups:
-            category_group_categories = self.project.get_categories(category_group)
-            category_group_operations = [x for x in year_operations if x.category in category_group_categories]
+    def set_month_totals(self, pivot):
+        balance_node, total_node = self.root_node.children[:2]
+        balance_node.month_totals = list(pivot.balance_row)
+        total_node.month_totals = list(pivot.total_row)
 
-            background_color = blend_vectors(category_group.color, (255, 255, 255), 0.8)
+        for node in self.nodes[2:]:
+            node.month_totals = list(pivot.rows.get(node.category, [0] * 12))
 
-            category_group_item = SummaryItem()
-            category_group_item.category = category_group
-            category_group_item.setText(0, f'{category_group.emoji} {category_group.name}')
+    def get_node(self, index):
+        if not index.isValid():
+            return None
+        return index.internalPointer()
 
-            category_group_item.operations = category_group_operations
-            category_group_item.reload()
+    def index(self, row, column, parent=QModelIndex()):
+        if not self.hasIndex(row, column, parent):
+            return QModelIndex()
 
-            for index in range(category_group_item.columnCount()):
-                category_group_item.setBackground(index, QColor(*background_color))
+        parent_node = self.get_node(parent) or self.root_node
+        return self.createIndex(row, column, parent_node.children[row])
 
-            category_group_item_map[category_group.id] = category_group_item
+    def parent(self, index):
+        node = self.get_node(index)
 
-        for category_group in self.project.category_groups:
-            category_group_item = category_group_item_map[category_group.id]
-            parent_category_group = category_group.parent_category_group
+        if node is None or node.parent is self.root_node:
+            return QModelIndex()
 
-            if parent_category_group:
-                parent_category_group_item = category_group_item_map[parent_category_group.id]
-                parent_category_group_item.addChild(category_group_item)
-            else:
-                self.addTopLevelItem(category_group_item)
+        return self.createIndex(node.parent.row, 0, node.parent)
 
-        for category in self.project.categories:
-            category_operations = [x for x in year_operations if x.category is category]
+    def rowCount(self, parent=QModelIndex()):
+        if parent.column() > 0:
+            return 0
 
-            background_color = blend_vectors(category.category_group.color, (255, 255, 255), 0.95)
+        parent_node = self.get_node(parent) or self.root_node
+        return len(parent_node.children)
 
-            category_item = SummaryItem()
-            category_item.category = category
-            category_item.setText(0, f'{category.emoji} {category.name}')
-            # category_item.setIcon(0, category.get_icon(16))
+    def columnCount(self, parent=QModelIndex()):
+        return len(self.HEADERS_LABEL)
 
-            category_item.operations = category_operations
-            category_item.reload()
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if orientation == Qt.Orientation.Horizontal and role == Qt.ItemDataRole.DisplayRole:
+            return self.HEADERS_LABEL[section]
 
-            for index in range(category_item.columnCount()):
-                category_item.setBackground(index, QColor(*background_color))
+        return None
 
-            category_group_item = category_group_item_map[category.category_group.id]
-            category_group_item.addChild(category_item)
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        node = self.get_node(index)
+        if node is None:
+            return None
 
-        # undefined category
-        undefined_category_operations = [x for x in year_operations if x.category is None]
+        column = index.column()
+
+        if role == Qt.ItemDataRole.SizeHintRole:
+            return self.size_hint
+
+        elif role == Qt.ItemDataRole.BackgroundRole:
+            return node.background
+
+        elif column == 0:
+            if role == Qt.ItemDataRole.DisplayRole:
+                return node.text
+
+        elif role == Qt.ItemDataRole.DisplayRole:
+            return Amount(node.month_totals[column - 1]).as_string_without_cents()
+
+        elif role == Qt.ItemDataRole.TextAlignmentRole:
+            return Qt.AlignmentFlag.AlignCenter
+
+        elif role == Qt.ItemDataRole.ForegroundRole:
+            color = node.get_color(node.month_totals[column - 1])
+            if color:
+                return QColor(*color)
+
+        return None
+
+
+class SummaryTree(QTreeView):
+
+    HEADERS_WIDTH = (250,) + (None,) * 12
+
+    selection_changed = Signal()
+
+    def __init__(self):
+        super().__init__()
+
+        self.summary_model = SummaryModel()
+        self.setModel(self.summary_model)
+
+        # self.setAlternatingRowColors(True)
+        self.setSelectionMode(self.SelectionMode.ExtendedSelection)
+        self.setIconSize(QSize(20, 20))
+        self.setUniformRowHeights(True)
+
+        header = self.header()
+        header.setDefaultAlignment(Qt.AlignmentFlag.AlignCenter)
+
+        for index, width in enumerate(self.HEADERS_WIDTH):
+            if width:
+                header.setSectionResizeMode(index, QHeaderView.ResizeMode.Fixed)
+                self.setColumnWidth(index, width)
+            else:
+                header.setSectionResizeMode(index, QHeaderView.ResizeMode.Stretch)
 
-        undefined_category_item = SummaryItem()
-        undefined_category_item.setText(0, f'{self.project.undefined_category.emoji} {self.project.undefined_category.name}')
-        undefined_category_item.operations = undefined_category_operations
+    @property
+    def project(self):
+        return self.summary_model.project
 
-        undefined_category_item.reload()
+    @project.setter
+    def project(self, project):
+        self.summary_model.project = project
 
-        for index in range(undefined_category_item.columnCount()):
-            undefined_category_item.setBackground(index, QColor(230, 230, 230))
+    @property
+    def selected_account(self):
+        return self.summary_model.selected_account
 
-        self.addTopLevelItem(undefined_category_item)
+    @selected_account.setter
+    def selected_account(self, account):
+        self.summary_model.selected_account = account
+
+    @property
+    def selected_year(self):
+        return self.summary_model.selected_year
+
+    @selected_year.setter
+    def selected_year(self, year):
+        self.summary_model.selected_year = year
+
+    def selectionChanged(self, selected, deselected):
+        super().selectionChanged(selected, deselected)
+        self.selection_changed.emit()
+
+    def get_selected_nodes(self):
+        return [self.summary_model.get_node(x) for x in self.selectionModel().selectedRows()]
+
+    def reload(self):
+        self.summary_model.reload()
 
 
 class SummaryWidget(QWidget):
@@ -1038,7 +1332,7 @@ class SummaryWidget(QWidget):
 
         self.summary_tree = SummaryTree()
         self.category_summary = CategorySummary()
-        self.summary_tree.itemSelectionChanged.connect(self.selection_changed)
+        self.summary_tree.selection_changed.connect(self.selection_changed)
 
         self.splitter = QSplitter(Qt.Orientation.Horizontal)
         self.splitter.addWidget(self.summary_tree)
@@ -1050,19 +1344,19 @@ class SummaryWidget(QWidget):
     def selection_changed(self):
         print('selection changed')
         category = None
-        operations = None
+        month_totals = None
 
-        selected_items = self.summary_tree.selectedItems()
+        selected_nodes = self.summary_tree.get_selected_nodes()
 
-        if selected_items:
-            selected_item = selected_items[0]
+        if selected_nodes:
+            selected_node = selected_nodes[0]
 
-            if getattr(selected_item, 'category', None):
-                category = selected_item.category
-                operations = selected_item.operations
+            if selected_node.category:
+                category = selected_node.category
+                month_totals = selected_node.get_month_amounts()
 
         self.category_summary.category = category
-        self.category_summary.operations = operations
+        self.category_summary.month_totals = month_totals
         self.category_summary.reload()
 
     def reload(self):
@@ -1074,13 +1368,58 @@ class SummaryWidget(QWidget):
         self.category_summary.reload()
 
 
+class WorkerSignals(QObject):
+
+    progress = Signal(int, int)
+    finished = Signal(object)
+    failed = Signal(str)
+
+
+class Worker(QRunnable):
+
+    def __init__(self, func, *args):
+        super().__init__()
+        self.func = func
+        self.args = args
+        self.signals = WorkerSignals()
+
+    def run(self):
+        try:
+            result = self.func(*self.args, progress=self.signals.progress.emit)
+        except Exception as e:
+            self.signals.failed.emit(f'{type(e).__name__}: {e}')
+        else:
+            self.signals.finished.emit(result)
+
+
 class ComptesWidget(QWidget):
 
+    # reloaded in this order by flush_reloads, each one by its reload_<view> method
+    RELOAD_VIEWS = (
+        'window_title',
+        'summary_widget',
+        'operations_tree',
+        'selection_info_label',
+        'account_info_label',
+        'recent_projects',
+    )
+
     def __init__(self):
         super().__init__()
 
         self.project = None
         self.current_file = None
+        self.worker = None
+
+        # reload scheduler
+        self.dirty_views = set()
+        self.reload_requests_count = 0
+        self.avoided_reloads_count = 0
+
+        self.reload_timer = QTimer(self)
+        self.reload_timer.setSingleShot(True)
+        self.reload_timer.setInterval(0)
+        self.reload_timer.timeout.connect(self.flush_reloads)
 
         # settings
         settings_file = os.path.join(os.getenv('APPDATA'), 'comptes', 'settings.json')
@@ -1112,24 +1451,39 @@ class ComptesWidget(QWidget):
         self.selection_info_label = QLabel()
         self.selection_info_label.setAlignment(Qt.AlignmentFlag.AlignRight)
 
+        self.status_label = QLabel()
+
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setMaximumWidth(200)
+        self.progress_bar.setVisible(False)
+
         operations_info_layout = QHBoxLayout()
         operations_info_layout.addWidget(self.account_info_label)
         operations_info_layout.addStretch()
+        operations_info_layout.addWidget(self.status_label)
+        operations_info_layout.addWidget(self.progress_bar)
         operations_info_layout.addWidget(self.selection_info_label)
 
         # operations_tree
         self.operations_tree = OperationsTree()
-        self.operations_tree.itemSelectionChanged.connect(self.reload_selection_info_label)
+        self.operations_tree.selection_changed.connect(self.reload_selection_info_label)
 
         self.tab = QTabWidget()
         self.tab.addTab(self.summary_widget, 'Summary')
         self.tab.addTab(self.operations_tree, 'Operations')
+        self.tab.currentChanged.connect(self.tab_changed)
+
+        self.tab_views = {
+            'summary_widget': self.summary_widget,
+            'operations_tree': self.operations_tree,
+        }
 
         # main_layout
         main_layout = QVBoxLayout()
         main_layout.addWidget(self.account_combo)
         main_layout.addWidget(self.years_combo)
         main_layout.addWidget(self.tab)
+        main_layout.addLayout(operations_info_layout)
 
         self.setLayout(main_layout)
 
@@ -1140,6 +1494,11 @@ class ComptesWidget(QWidget):
         self.settings.save()
         super().hideEvent(event)
 
+    def compact_project(self):
+        # run on quit only, a minimized window is hidden too and must not rewrite the file
+        if not self.is_busy() and not self.project.journal_entries:
+            self.project.compact()
+
     def ask_save_project(self):
         if not self.current_file:
             self.ask_save_as_project()
@@ -1193,39 +1552,132 @@ class ComptesWidget(QWidget):
 
         self.open_project(file)
     
+    def is_busy(self):
+        return self.worker is not None
+
+    def start_worker(self, message, func, *args, finished=None):
+        if self.is_busy():
+            raise Exception('Another task is already running')
+
+        self.worker = Worker(func, *args)
+        self.worker.signals.progress.connect(self.worker_progress)
+        self.worker.signals.finished.connect(partial(self.worker_finished, finished))
+        self.worker.signals.failed.connect(self.worker_failed)
+
+        self.set_busy(message)
+        QThreadPool.globalInstance().start(self.worker)
+
+    def worker_progress(self, done, total):
+        self.progress_bar.setRange(0, total)
+        self.progress_bar.setValue(done)
+
+    def worker_finished(self, finished, result):
+        self.worker = None
+        self.set_idle()
+
+        if finished is not None:
+            finished(result)
+
+    def worker_failed(self, message):
+        self.worker = None
+        self.set_idle(message)
+        print(message)
+
+    def set_busy(self, message):
+        # the project must not change while a worker reads it
+        for action in self.findChildren(QAction):
+            action.setEnabled(False)
+        self.tab.setEnabled(False)
+        self.account_combo.setEnabled(False)
+        self.years_combo.setEnabled(False)
+
+        self.status_label.setText(message)
+        self.progress_bar.setRange(0, 0)
+        self.progress_bar.setVisible(True)
+
+    def set_idle(self, message=''):
+        for action in self.findChildren(QAction):
+            action.setEnabled(True)
+        self.tab.setEnabled(True)
+        self.account_combo.setEnabled(True)
+        self.years_combo.setEnabled(True)
+
+        self.status_label.setText(message)
+        self.progress_bar.setVisible(False)
+
     def save_project(self, file):
-        self.project.save(file)
+        # saving over the opened file only appends the changes to its journal
+        if file == self.project.file and os.path.isfile(file):
+            self.project.save_journal()
+            self.project_saved(file)
+            return
+
+        project = self.project
+        journal_entries_count = len(project.journal_entries)
+
+        def write(progress=None):
+            project.write(file)
+
+        def finished(_):
+            project.set_saved(file, journal_entries_count)
+            self.project_saved(file)
+
+        self.start_worker(f'Saving {os.path.basename(file)}...', write, finished=finished)
+
+    def project_saved(self, file):
         self.current_file = file
         self.settings.add_current_file(file)
-        self.reload()
+        self.schedule_reload('window_title', 'recent_projects')
         print(f'File saved at {file!r}')
     
     def new_project(self):
-        self.project = Project.new()
+        self.set_project(Project.new())
         self.current_file = None
         self.reload()
     
     def open_project(self, file):
-        self.project = Project.open(file)
-        self.current_file = file
-        self.settings.add_current_file(file)
-        self.reload()
+        def finished(project):
+            # the opened project replaces the current one in one go, once fully loaded
+            self.set_project(project)
+            self.current_file = file
+            self.settings.add_current_file(file)
+            self.reload()
+
+        self.start_worker(f'Opening {os.path.basename(file)}...', Project.open, file, finished=finished)
     
-    def import_credit_agricole_csv(self):
+    def import_operations(self):
         account = self.account_combo.currentData(Qt.ItemDataRole.UserRole)
 
         if account is None:
             raise Exception('No account selected')
 
-        path, flt = QFileDialog.getOpenFileName(self)
+        extensions = ' '.join(f'*{x}' for x in get_importer_extensions())
+        path, flt = QFileDialog.getOpenFileName(self, 'Import', filter=f'Statements ({extensions});;All Files (*)')
 
         if not path:
             print('Operation canceled')
             return
 
-        self.project.import_credit_agricole_csv(path, account)
-
-        self.reload()
+        def finished(result):
+            operations, skipped_operations = result
+
+            with self.project.batch() as batch:
+                for operation in operations:
+                    batch.add(operation)
+
+            categorized_count = sum(x.category is not None for x in operations)
+            message = f'{len(operations)} operations imported, {categorized_count} categorized'
+            if skipped_operations:
+                message += f', {len(skipped_operations)} already in the project skipped'
+            self.status_label.setText(message)
+
+        self.start_worker(
+            f'Importing {os.path.basename(path)}...',
+            self.project.read_import,
+            path,
+            account,
+            finished=finished,
+        )
 
     def print_project(self):
         print_json(self.project)
@@ -1262,11 +1714,9 @@ class ComptesWidget(QWidget):
         run_test_action.setShortcut('Ctrl+/')
         run_test_action.triggered.connect(run_test_func)
 
-        import_ca_action = QAction('Crédit Agricole (.csv)', self)
-        import_ca_action.triggered.connect(self.import_credit_agricole_csv)
-
-        import_menu = QMenu('Import')
-        import_menu.addAction(import_ca_action)
+        import_action = QAction('Import...', self)
+        import_action.setShortcut('Ctrl+I')
+        import_action.triggered.connect(self.import_operations)
 
         file_menu = QMenu('File')
         file_menu.addAction(ask_new_project_action)
@@ -1278,7 +1728,7 @@ class ComptesWidget(QWidget):
 
         file_menu.addAction(ask_open_project_action)
         file_menu.addMenu(self.open_recent_projects_menu)
-        file_menu.addMenu(import_menu)
+        file_menu.addAction(import_action)
 
         dev_menu = QMenu('Dev')
         dev_menu.addAction(print_project_action)
@@ -1288,6 +1738,9 @@ class ComptesWidget(QWidget):
         guess_category_on_selected_operations_act = QAction('Guess Category on Selected Operations', self)
         guess_category_on_selected_operations_act.triggered.connect(self.guess_category_on_selected_operations)
 
+        guess_category_on_all_operations_act = QAction('Guess Category on All Operations', self)
+        guess_category_on_all_operations_act.triggered.connect(self.guess_category_on_all_operations)
+
         edit_account_act = QAction('Edit Current Account', self)
         edit_account_act.triggered.connect(self.edit_account)
 
@@ -1316,6 +1769,7 @@ class ComptesWidget(QWidget):
         edit_menu.addAction(duplicate_offset_one_month_selected_operations_act)
         edit_menu.addSeparator()
         edit_menu.addAction(guess_category_on_selected_operations_act)
+        edit_menu.addAction(guess_category_on_all_operations_act)
         edit_menu.addSeparator()
         edit_menu.addAction(delete_operations_act)
 
@@ -1338,30 +1792,13 @@ class ComptesWidget(QWidget):
         return menu_bar
 
     def guess_category_on_selected_operations(self):
-        selected_operation_items = self.operations_tree.get_selected_operation_items()
-
-        for operation_item in selected_operation_items:
-            operation = operation_item.operation
-
-            operation_label_lower = operation.label.lower()
-
-            new_category = None
-            for category in self.project.categories:
-                if new_category:
-                    break
-
-                for keyword in category.keywords:
-                    keyword_lower = keyword.lower()
-
-                    if keyword_lower in operation_label_lower:
-                        new_category = category
-                        break
+        selected_operations = self.operations_tree.get_selected_operations()
 
-            if new_category:
-                operation.category = new_category
+        self.project.categorize_operations(selected_operations)
 
-        for operation_item in selected_operation_items:
-            operation_item.reload()
+    def guess_category_on_all_operations(self):
+        operations = self.project.categorize_operations()
+        print(f'{len(operations)} operations categorized')
 
     def edit_categories(self):
         category_view = CategoryView(self)
@@ -1371,65 +1808,63 @@ class ComptesWidget(QWidget):
 
         proceed = category_view.exec()
 
+        # the view edits categories in place, even when closed
+        self.project.update_categories()
+
         if not proceed:
             print('Operation Canceled')
             return
 
-        self.reload()
-
-    def get_selected_visible_operation_items(self):
+    def get_selected_visible_operations(self):
         operation_tree_is_visible = self.tab.currentWidget() is self.operations_tree
         if operation_tree_is_visible:
-            selected_operation_items = self.operations_tree.get_selected_operation_items()
+            selected_operations = self.operations_tree.get_selected_operations()
         else:
-            selected_operation_items = None
+            selected_operations = None
 
-        return selected_operation_items
+        return selected_operations
 
     def duplicate_selected_operations(self):
-        selected_operation_items = self.get_selected_visible_operation_items()
+        selected_operations = self.get_selected_visible_operations()
 
-        if not selected_operation_items:
+        if not selected_operations:
             raise Exception('No operation selected')
 
-        for selected_operation_item in selected_operation_items:
-            source_operation = selected_operation_item.operation
+        with self.project.batch() as batch:
+            for source_operation in selected_operations:
 
-            destination_operation = source_operation.get_copy()
+                destination_operation = source_operation.get_copy()
+                destination_operation.id = random_id()
 
-            self.project.operations.append(destination_operation)
-
-        self.reload()
+                batch.add(destination_operation)
 
     def duplicate_offset_one_month_selected_operations(self):
-        selected_operation_items = self.get_selected_visible_operation_items()
+        selected_operations = self.get_selected_visible_operations()
 
-        if not selected_operation_items:
+        if not selected_operations:
             raise Exception('No operation selected')
 
-        for selected_operation_item in selected_operation_items:
-            source_operation = selected_operation_item.operation
+        with self.project.batch() as batch:
+            for source_operation in selected_operations:
 
-            destination_operation = source_operation.get_copy()
+                destination_operation = source_operation.get_copy()
+                destination_operation.id = random_id()
 
-            new_date = destination_operation.date.addMonths(1)
-            new_date = Date(new_date)
+                new_date = destination_operation.date.add_months(1)
 
-            destination_operation.date = new_date
+                destination_operation.date = new_date
 
-            self.project.operations.append(destination_operation)
-
-        self.reload()
+                batch.add(destination_operation)
 
     def delete_operations(self):
-        selected_operation_items = self.get_selected_visible_operation_items()
+        selected_operations = self.get_selected_visible_operations()
 
-        if not selected_operation_items:
+        if not selected_operations:
             raise Exception('No operation selected')
 
         proceed = QMessageBox.question(
             self,
-            f'Delete {len(selected_operation_items)} operations?',
+            f'Delete {len(selected_operations)} operations?',
             'This is not undoable. Are you sure?',
             QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No
         )
@@ -1438,21 +1873,17 @@ class ComptesWidget(QWidget):
             print('Operation Canceled')
             return
 
-        for selected_operation_item in selected_operation_items:
-            operation = selected_operation_item.operation
-            self.project.safe_delete_operation(operation)
-
-        self.reload()
+        self.project.delete_operations([x.id for x in selected_operations])
 
     def edit_operation(self):
 
-        selected_operation_items = self.get_selected_visible_operation_items()
+        selected_operations = self.get_selected_visible_operations()
 
-        if not selected_operation_items:
+        if not selected_operations:
             raise Exception('No operation selected')
 
-        selected_operation_item = selected_operation_items[0]
-        selected_operation = selected_operation_item.operation
+        selected_operation = selected_operations[0]
+        previous_operation = selected_operation.get_copy()
 
         operation_editor = OperationEditor(self)
         operation_editor.project = self.project
@@ -1465,7 +1896,7 @@ class ComptesWidget(QWidget):
             print('Operation Canceled')
             return
 
-        selected_operation_item.reload()
+        self.project.update_operation(selected_operation, previous_operation)
 
     def create_operation(self):
         operation = Operation()
@@ -1482,9 +1913,7 @@ class ComptesWidget(QWidget):
             print('Operation Canceled')
             return
 
-        self.project.operations.append(operation_editor.operation)
-
-        self.reload()
+        self.project.add_operation(operation_editor.operation)
 
     def edit_account(self):
         selected_account = self.account_combo.currentData(Qt.ItemDataRole.UserRole)
@@ -1502,7 +1931,7 @@ class ComptesWidget(QWidget):
             print('Operation Canceled')
             return
 
-        self.reload()
+        self.project.update_accounts()
 
     def create_account(self):
         account_editor = AccountEditor(self)
@@ -1514,9 +1943,57 @@ class ComptesWidget(QWidget):
             print('Operation Canceled')
             return
 
-        self.project.accounts.append(account_editor.account)
+        self.project.add_account(account_editor.account)
 
-        self.reload()
+    def set_project(self, project):
+        if self.project is not None:
+            self.project.remove_listener(self.project_changed)
+
+        self.project = project
+        self.project.add_listener(self.project_changed)
+
+    def project_changed(self, change):
+        # views are patched from what changed rather than rebuilt
+        if change.accounts:
+            self.patch_accounts_combo()
+            self.schedule_reload('account_info_label')
+
+        if change.categories:
+            self.schedule_reload('summary_widget')
+            self.patch_operations_tree(change)
+
+        if not change.get_operations():
+            return
+
+        years = self.project.get_years()
+        if years != [self.years_combo.itemText(x) for x in range(self.years_combo.count())]:
+            self.reload_years_combo()
+
+        self.patch_operations_tree(change)
+        self.schedule_reload('summary_widget', 'selection_info_label', 'account_info_label')
+
+    def patch_operations_tree(self, change):
+        # a hidden or already dirty tree is rebuilt when shown anyway
+        if 'operations_tree' in self.dirty_views or self.tab.currentWidget() is not self.operations_tree:
+            self.schedule_reload('operations_tree')
+            return
+
+        self.operations_tree.project_changed(change)
+
+    def patch_accounts_combo(self):
+        accounts = self.project.accounts
+
+        self.account_combo.blockSignals(True)
+        for index, account in enumerate(accounts):
+            if index < self.account_combo.count():
+                self.account_combo.setItemText(index, str(account))
+            else:
+                self.account_combo.addItem(str(account), userData=account)
+        self.account_combo.blockSignals(False)
+
+        # the first account of a project gets selected
+        if accounts and self.account_combo.currentIndex() == -1:
+            self.account_combo.setCurrentIndex(0)
 
     def reload_window_title(self):
         s = 'Comptes'
@@ -1528,13 +2005,43 @@ class ComptesWidget(QWidget):
         self.setWindowTitle(s)
 
     def reload_children(self):
-        self.reload_window_title()
-        self.reload_summary_widget()
-        # self.reload_monthly_table()
-        self.reload_operations_tree()
-        self.reload_selection_info_label()
-        self.reload_account_info_label()
-        self.reload_recent_projects()
+        self.schedule_reload(*self.RELOAD_VIEWS)
+
+    def schedule_reload(self, *views):
+        # combo signals and explicit reloads pile up during one event, they are flushed once afterwards
+        self.dirty_views.update(views)
+        self.reload_requests_count += len(views)
+        self.reload_timer.start()
+
+    def flush_reloads(self):
+        reloaded_views = list()
+
+        for view in self.RELOAD_VIEWS:
+            if view not in self.dirty_views:
+                continue
+
+            # a hidden tab stays dirty until it is shown
+            tab_view = self.tab_views.get(view)
+            if tab_view is not None and self.tab.currentWidget() is not tab_view:
+                continue
+
+            self.dirty_views.remove(view)
+            getattr(self, f'reload_{view}')()
+            reloaded_views.append(view)
+
+        avoided_reloads_count = self.reload_requests_count - len(reloaded_views) - len(self.dirty_views)
+        self.avoided_reloads_count += avoided_reloads_count
+        self.reload_requests_count = len(self.dirty_views)
+
+        if avoided_reloads_count:
+            print(
+                f'Reloaded {", ".join(reloaded_views)}, '
+                f'{avoided_reloads_count} redundant reloads avoided ({self.avoided_reloads_count} in total)'
+            )
+
+    def tab_changed(self):
+        # the operations tree resets its selection when reloaded
+        self.schedule_reload('selection_info_label')
 
     def reload_recent_projects(self):
         self.open_recent_projects_menu.clear()
@@ -1575,9 +2082,9 @@ class ComptesWidget(QWidget):
         self.operations_tree.reload()
 
     def reload_selection_info_label(self):
-        selected_items = self.operations_tree.selectedItems()
+        selected_operations = self.operations_tree.get_selected_operations()
 
-        n_selected = len(selected_items)
+        n_selected = len(selected_operations)
 
         # selection info
         sum_amount = 0
@@ -1597,10 +2104,8 @@ class ComptesWidget(QWidget):
         account = self.account_combo.currentData(Qt.ItemDataRole.UserRole)
 
         if account:
-            account_operations = self.project.get_account_operations(account)
-
-            account_balance = self.project.get_balance(account_operations)
-            account_operations_number = len(account_operations)
+            account_balance = self.project.get_balance(account)
+            account_operations_number = self.project.get_account_operations_count(account)
         else:
             account_balance = Amount()
             account_operations_number = 0
@@ -1629,6 +2134,7 @@ class ComptesWidget(QWidget):
         years = self.project.get_years()
 
         current_index = self.years_combo.currentIndex()
+        current_year = self.years_combo.currentText()
 
         self.years_combo.clear()
         for year in years:
@@ -1637,7 +2143,10 @@ class ComptesWidget(QWidget):
         if not years:
             return
 
-        if current_index == -1:
+        # a new year may shift the selected one
+        if current_year in years:
+            current_index = years.index(current_year)
+        elif current_index == -1 or current_index >= len(years):
             current_index = 0
 
         self.years_combo.setCurrentIndex(current_index)
@@ -1657,7 +2166,7 @@ class CategorySummary(QWidget):
 
         self.project = None
         self.category = None
-        self.operations = None
+        self.month_totals = None
 
         self.name_label = QLabel()
         self.stats_label = QLabel()
@@ -1696,13 +2205,12 @@ class CategorySummary(QWidget):
 
         self.name_label.setText(f'{self.category.emoji} {self.category.name}')
 
-        operations = Operations()
-        operations.operations = self.operations
+        year_total = Amount.sum(self.month_totals)
 
         self.stats_label.setText(
             self.stats_pattern.format(
-                total=operations.get_year_total(),
-                average=operations.get_month_average() or '-',
+                total=year_total,
+                average=year_total / 12 or '-',
             )
         )
 
@@ -1724,9 +2232,8 @@ class CategorySummary(QWidget):
         series = QLineSeries()
         series.setColor(QColor(*self.category.get_color()))
 
-        month_totals = operations.get_month_total()
         max_total_abs = 50
-        for index, (month, total) in enumerate(month_totals.items()):
+        for index, total in enumerate(self.month_totals):
             total_abs = abs(total.as_units())
             series.append(index, total_abs)
             if total_abs > max_total_abs:
@@ -1758,6 +2265,50 @@ class CategorySummary(QWidget):
         self.chartView.setChart(chart)
 
 
+def create_category_icon(text, color, radius):
+    pixmap = create_category_pixmap(text, color, radius)
+
+    icon = QIcon()
+    icon.addPixmap(pixmap, QIcon.Mode.Normal, QIcon.State.On)
+    return icon
+
+
+def create_category_pixmap(text, color, radius):
+    size = radius * 2
+
+    pixmap = QPixmap(size, size)
+    pixmap.fill(QColor(0, 0, 0, 0))
+
+    painter = QPainter(pixmap)
+    painter.setRenderHints(
+        QPainter.RenderHint.Antialiasing | QPainter.RenderHint.TextAntialiasing | QPainter.SmoothPixmapTransform)
+
+    painter.setBrush(QColor(*color))
+    painter.setPen(Qt.PenStyle.NoPen)
+    margin = max(2, size // 20)
+    circle_rect = QRectF(margin, margin, size - margin * 2, size - margin * 2)
+    painter.drawEllipse(circle_rect)
+
+    font = QFont()
+    font.setPixelSize(int(size * 0.6))
+    painter.setFont(font)
+
+    painter.setPen(QColor('white'))
+    painter.drawText(pixmap.rect(), Qt.AlignmentFlag.AlignCenter, text)
+    painter.end()
+
+    return pixmap
+
+
+def get_category_icon(item, radius):
+    icon = create_category_icon(
+        text=item.emoji,
+        color=item.get_color(),
+        radius=radius
+    )
+    return icon
+
+
 def open_comptes():
     app = QApplication()
 
@@ -1773,4 +2324,6 @@ def open_comptes():
     w.windowTitleChanged.connect(ui.setWindowTitle)
     w.windowTitleChanged.emit(w.windowTitle())
 
+    app.aboutToQuit.connect(w.compact_project)
+
     app.exec_()
\ No newline at end of file
@@ -1,37 +1,140 @@
+import codecs
 import json
+import mmap
+import os
 import re
+import shutil
+import struct
+import sys
+import tempfile
+from array import array
 from datetime import datetime
 import random
 import string
-from PySide6.QtGui import *
-from PySide6.QtCore import *
+
+
+RANDOM_ID_TABLE = bytes(ord(string.ascii_uppercase[x % 26]) for x in range(256))
+
+BINARY_MAGIC = b'CPTB'
+BINARY_VERSION = 1
+BINARY_ALIGNMENT = 8
+
+ENCODING_BOMS = (
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+)
 
 
 def random_id():
-    return ''.join(random.choice(string.ascii_uppercase) for _ in range(8))
+    return random.randbytes(8).translate(RANDOM_ID_TABLE).decode('ascii')
+
+
+def random_ids(count):
+    s = random.randbytes(8 * count).translate(RANDOM_ID_TABLE).decode('ascii')
+    return [s[x:x + 8] for x in range(0, 8 * count, 8)]
 
 
 def print_json(data):
     print(json_dumps(data))
 
 
-def json_dumps(data):
+def get_json_default(x):
+    if hasattr(x, 'get_data'):
+        return x.get_data()
+    else:
+        return str(x)
 
-    def plop(x):
-        if hasattr(x, 'get_data'):
-            return x.get_data()
-        else:
-            return str(x)
 
-    s = json.dumps(data, default=plop, ensure_ascii=False, indent=4)
+def json_dumps(data, indent=4):
+    s = json.dumps(data, default=get_json_default, ensure_ascii=False, indent=indent)
     return s
 
 
-def json_dump(data, file):
-    s = json_dumps(data)
+def json_dump(data, file, backups=0):
+    with AtomicFile(file, 'w', backups=backups) as f:
+        json.dump(data, f, default=get_json_default, ensure_ascii=False, indent=4)
+
+
+class AtomicFile:
+
+    def __init__(self, file, mode='w', backups=0):
+        self.file = os.path.abspath(file)
+        self.mode = mode
+        self.backups = backups
+        self.temp_file = None
+        self.f = None
+
+    def __enter__(self):
+        # same directory so the final rename never crosses file systems
+        folder, name = os.path.split(self.file)
+        fd, self.temp_file = tempfile.mkstemp(prefix=f'.{name}.', suffix='.tmp', dir=folder)
+        if os.path.exists(self.file):
+            file_mode = os.stat(self.file).st_mode & 0o777
+        else:
+            # mkstemp creates 0o600, a new file gets what open() would have given it
+            umask = os.umask(0)
+            os.umask(umask)
+            file_mode = 0o666 & ~umask
+        os.chmod(self.temp_file, file_mode)
+
+        encoding = None if 'b' in self.mode else 'utf-8'
+        self.f = os.fdopen(fd, self.mode, encoding=encoding)
+        return self.f
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        try:
+            if exc_type is None:
+                self.f.flush()
+                os.fsync(self.f.fileno())
+            self.f.close()
+        except BaseException:
+            os.remove(self.temp_file)
+            raise
+
+        if exc_type is not None:
+            os.remove(self.temp_file)
+            return False
+
+        if self.backups and os.path.exists(self.file):
+            rotate_backups(self.file, self.backups)
+
+        os.replace(self.temp_file, self.file)
+        fsync_folder(os.path.dirname(self.file))
+        return False
+
+
+def get_backup_file(file, index):
+    return f'{file}.{index}.bak'
+
+
+def rotate_backups(file, count):
+    for index in range(count - 1, 0, -1):
+        backup_file = get_backup_file(file, index)
+        if os.path.exists(backup_file):
+            os.replace(backup_file, get_backup_file(file, index + 1))
+
+    # the current file is about to be replaced, a hard link keeps it for free
+    backup_file = get_backup_file(file, 1)
+    if os.path.exists(backup_file):
+        os.remove(backup_file)
+
+    try:
+        os.link(file, backup_file)
+    except OSError:
+        shutil.copy2(file, backup_file)
+
+
+def fsync_folder(folder):
+    # makes the rename itself durable, not supported on windows
+    if os.name != 'posix':
+        return
 
-    with open(file, 'w', encoding='utf-8') as f:
-        f.write(s)
+    fd = os.open(folder, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
 
 
 def json_load(file):
@@ -41,6 +144,253 @@ def json_load(file):
     return data
 
 
+class JsonStreamReader:
+
+    whitespace_pattern = re.compile(r'[ \t\n\r]*')
+
+    def __init__(self, f, chunk_size=1 << 16):
+        self.file = f
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+
+        self.buffer = ''
+        self.index = 0
+        self.eof = False
+
+        self.size = 0
+        self.position = 0
+        self.progress = None
+
+    def read(self, size=None):
+        # drop what has already been decoded before growing the buffer
+        if self.index:
+            self.buffer = self.buffer[self.index:]
+            self.index = 0
+
+        chunk = self.file.read(size or self.chunk_size)
+        if not chunk:
+            self.eof = True
+
+        self.buffer += chunk
+
+        # characters read, close enough to bytes for a progress bar
+        self.position += len(chunk)
+        if self.progress is not None:
+            self.progress(min(self.position, self.size), self.size)
+
+    def peek(self):
+        while True:
+            self.index = self.whitespace_pattern.match(self.buffer, self.index).end()
+
+            if self.index < len(self.buffer):
+                return self.buffer[self.index]
+
+            if self.eof:
+                raise ValueError('Unexpected end of JSON document')
+
+            self.read()
+
+    def next(self):
+        character = self.peek()
+        self.index += 1
+        return character
+
+    def expect(self, character):
+        found_character = self.next()
+        if found_character != character:
+            raise ValueError(f'Expected {character!r} but found {found_character!r}')
+
+    def decode(self):
+        self.peek()
+
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.index)
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+                # grow geometrically so a large value is not re-parsed once per chunk
+                self.read(max(self.chunk_size, len(self.buffer)))
+                continue
+
+            # a number at the end of the buffer may continue in the next chunk
+            if end == len(self.buffer) and not self.eof:
+                self.read()
+                continue
+
+            self.index = end
+            return value
+
+    def iter_items(self, stream_keys=()):
+        self.expect('{')
+
+        if self.peek() == '}':
+            self.next()
+            return
+
+        while True:
+            key = self.decode()
+            self.expect(':')
+
+            if key in stream_keys and self.peek() == '[':
+                self.next()
+
+                if self.peek() == ']':
+                    self.next()
+                else:
+                    while True:
+                        yield key, self.decode()
+
+                        if self.get_separator(']'):
+                            break
+            else:
+                yield key, self.decode()
+
+            if self.get_separator('}'):
+                break
+
+    def get_separator(self, closing_character):
+        character = self.next()
+
+        if character == closing_character:
+            return True
+        elif character == ',':
+            return False
+
+        raise ValueError(f'Expected {closing_character!r} or \',\' but found {character!r}')
+
+
+def json_iter_load(file, stream_keys=(), progress=None):
+    with open(file, 'r', encoding='utf-8') as f:
+        reader = JsonStreamReader(f)
+        reader.size = os.path.getsize(file)
+        reader.progress = progress
+        yield from reader.iter_items(stream_keys)
+
+
+class BinaryContainer:
+
+    def __init__(self, file):
+        self.file = open(file, 'rb')
+        self.mmap = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.sections = dict()
+
+        magic, version, sections_count = struct.unpack_from('<4sII', self.mmap, 0)
+        if magic != BINARY_MAGIC:
+            self.close()
+            raise Exception(f'File {file!r} is not a binary project')
+
+        if version > BINARY_VERSION:
+            self.close()
+            raise Exception(f'Binary version {version} is not supported')
+
+        position = struct.calcsize('<4sII')
+        for _ in range(sections_count):
+            name_length, = struct.unpack_from('<H', self.mmap, position)
+            position += 2
+            name = bytes(self.mmap[position:position + name_length]).decode('utf-8')
+            position += name_length
+            offset, length = struct.unpack_from('<QQ', self.mmap, position)
+            position += 16
+
+            self.sections[name] = offset, length
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        self.mmap.close()
+        self.file.close()
+
+    def get_bytes(self, name):
+        offset, length = self.sections[name]
+        return self.mmap[offset:offset + length]
+
+    def get_array(self, name, typecode):
+        offset, length = self.sections[name]
+
+        values = array(typecode)
+        with memoryview(self.mmap) as view:
+            with view[offset:offset + length] as section_view:
+                values.frombytes(section_view)
+
+        if sys.byteorder != 'little':
+            values.byteswap()
+
+        return values
+
+    def get_json(self, name):
+        return json.loads(self.get_bytes(name).decode('utf-8'))
+
+
+def binary_dump(sections, file, backups=0):
+    names = [x.encode('utf-8') for x in sections]
+
+    header_size = struct.calcsize('<4sII') + sum(2 + len(x) + 16 for x in names)
+
+    table = list()
+    offset = header_size
+    for data in sections.values():
+        offset += -offset % BINARY_ALIGNMENT
+        table.append((offset, len(data)))
+        offset += len(data)
+
+    with AtomicFile(file, 'wb', backups=backups) as f:
+        f.write(struct.pack('<4sII', BINARY_MAGIC, BINARY_VERSION, len(names)))
+        for name, (offset, length) in zip(names, table):
+            f.write(struct.pack('<H', len(name)) + name + struct.pack('<QQ', offset, length))
+
+        # sections are aligned so they can be viewed in place from a memory map
+        position = header_size
+        for data, (offset, length) in zip(sections.values(), table):
+            f.write(b'\0' * (offset - position))
+            f.write(data)
+            position = offset + length
+
+
+def binary_load(file):
+    return BinaryContainer(file)
+
+
+def is_binary_file(file):
+    with open(file, 'rb') as f:
+        return f.read(len(BINARY_MAGIC)) == BINARY_MAGIC
+
+
+def get_array_bytes(values):
+    if sys.byteorder != 'little':
+        values = array(values.typecode, values)
+        values.byteswap()
+
+    return values.tobytes()
+
+
+def detect_encoding(file, block_size=1 << 20):
+    with open(file, 'rb') as f:
+        head = f.read(block_size)
+
+        for bom, encoding in ENCODING_BOMS:
+            if head.startswith(bom):
+                return encoding
+
+        # the whole file must decode, a statement may only have its first accented character deep down;
+        # blocks may end in the middle of a character, an incremental decoder carries it over
+        decoder = codecs.getincrementaldecoder('utf-8')()
+        try:
+            block = head
+            while block:
+                decoder.decode(block)
+                block = f.read(block_size)
+            decoder.decode(b'', final=True)
+        except UnicodeDecodeError:
+            return 'cp1252'
+
+    return 'utf-8'
+
+
 def get_one_liner_text(text):
     text = text.replace('\n', ' ')
     text = re.sub(' +', ' ', text)
@@ -74,41 +424,6 @@ def split_date(date):
     return data
 
 
-def create_category_icon(text, color, radius):
-    pixmap = create_category_pixmap(text, color, radius)
-
-    icon = QIcon()
-    icon.addPixmap(pixmap, QIcon.Mode.Normal, QIcon.State.On)
-    return icon
-
-
-def create_category_pixmap(text, color, radius):
-    size = radius * 2
-
-    pixmap = QPixmap(size, size)
-    pixmap.fill(QColor(0, 0, 0, 0))
-
-    painter = QPainter(pixmap)
-    painter.setRenderHints(
-        QPainter.RenderHint.Antialiasing | QPainter.RenderHint.TextAntialiasing | QPainter.SmoothPixmapTransform)
-
-    painter.setBrush(QColor(*color))
-    painter.setPen(Qt.PenStyle.NoPen)
-    margin = max(2, size // 20)
-    circle_rect = QRectF(margin, margin, size - margin * 2, size - margin * 2)
-    painter.drawEllipse(circle_rect)
-
-    font = QFont()
-    font.setPixelSize(int(size * 0.6))
-    painter.setFont(font)
-
-    painter.setPen(QColor('white'))
-    painter.drawText(pixmap.rect(), Qt.AlignmentFlag.AlignCenter, text)
-    painter.end()
-
-    return pixmap
-
-
 def blend_vectors(vector_a, vector_b, blender):
 
     result = list()